@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the LAN8651 register access paths
+
+Runs without hardware: every benchmark works against temporary files or
+in-process stand-ins for the kernel interfaces.
+
+The 'startup' benchmark runs the command line tool against a fake sysfs
+tree and exits non-zero when import or command start-up time exceeds its
+budget.
+"""
+
+import os
+import py_compile
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import lan8651_kernelfs
+from lan8651_kernelfs import (LAN8651Debugfs, LAN8651_DUMP_REGISTERS, LAN8651_REGISTERS,
+                              TC6Backend, TC6Simulator, plan_burst_reads)
+
+DEFAULT_ITERATIONS = 20000
+
+# Start-up budgets in milliseconds. Command times are taken above a bare
+# interpreter start, so they do not depend on how fast python itself starts.
+STARTUP_IMPORT_BUDGET_MS = 40
+STARTUP_COMMAND_BUDGET_MS = 60
+STARTUP_RUNS = 7
+STARTUP_COMMANDS = (
+    ['read', 'OA_STATUS0'],
+    ['list'],
+    ['status'],
+)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def report(name, iterations, elapsed):
+    """Print one benchmark result line"""
+    print(f"  {name:<32} {elapsed * 1e6 / iterations:8.2f} us/op "
+          f"({iterations} ops in {elapsed:.3f}s)")
+
+def timed(func, iterations):
+    """Call func(i) iterations times and return the elapsed seconds"""
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return time.perf_counter() - start
+
+def make_device(debugfs_path):
+    """Create a LAN8651Debugfs pointed at a fake debugfs directory"""
+    device = LAN8651Debugfs()
+    device.debugfs_path = debugfs_path
+    device.sysfs_path = None
+    return device
+
+def bench_debugfs(iterations):
+    """Compare open()-per-access against the persistent descriptor paths"""
+    print("\ndebugfs file access:")
+    addresses = list(LAN8651_DUMP_REGISTERS)
+
+    with tempfile.TemporaryDirectory() as debugfs_path:
+        reg_access = f"{debugfs_path}/reg_access"
+        open(reg_access, 'w').close()
+        with open(f"{debugfs_path}/registers", 'w') as f:
+            f.write(''.join(f"0x{address:08x}: 0x{address:08x}\n" for address in addresses))
+
+        def legacy_transfer(i):
+            # Previous access pattern: one open() for the command, one for the reply
+            with open(reg_access, 'w') as f:
+                f.write(f"read 0x{addresses[i % len(addresses)]:08x} 1")
+            with open(reg_access, 'r') as f:
+                return f.read()
+
+        with make_device(debugfs_path) as device:
+            def persistent_transfer(i):
+                return device.debugfs_transfer(
+                    'reg_access', f"read 0x{addresses[i % len(addresses)]:08x} 1")
+
+            def register_map(i):
+                return device.read_many_via_debugfs(addresses)
+
+            legacy = timed(legacy_transfer, iterations)
+            persistent = timed(persistent_transfer, iterations)
+            full_map = timed(register_map, iterations)
+
+        report("open/write/open/read", iterations, legacy)
+        report("persistent pwrite/pread", iterations, persistent)
+        print(f"  speedup: {legacy / persistent:.1f}x")
+        report(f"full map ({len(addresses)} registers)", iterations, full_map)
+
+def bench_tc6(iterations):
+    """Raw TC6 control-transaction throughput against the simulator"""
+    print("\nTC6 control transactions (in-process simulator):")
+    base = LAN8651_REGISTERS['STATS0']
+    count = 13
+    tc6 = TC6Backend(TC6Simulator({base + i: i for i in range(count)}))
+
+    def single_reads(i):
+        for offset in range(count):
+            tc6.read_burst(base + offset, 1)
+
+    def burst_read(i):
+        tc6.read_burst(base, count)
+
+    rounds = max(1, iterations // count)
+    single = timed(single_reads, rounds)
+    burst = timed(burst_read, rounds)
+
+    report(f"{count} x 1-register reads", rounds, single)
+    report(f"1 x {count}-register burst", rounds, burst)
+    print(f"  registers/s: {rounds * count / single:,.0f} single, "
+          f"{rounds * count / burst:,.0f} burst")
+
+    addresses = list(LAN8651_DUMP_REGISTERS)
+    runs = plan_burst_reads(addresses)
+    print(f"  burst plan for all {len(addresses)} known registers: "
+          f"{len(runs)} transactions ({len(addresses) - len(runs)} saved)")
+
+def make_fake_sysfs(root):
+    """Create a sysfs/debugfs tree with one lan865x interface (eth1 on spi0.0)"""
+    spi_device = f"{root}/sys/devices/platform/soc/spi0/spi0.0"
+    driver = f"{root}/sys/bus/spi/drivers/lan865x"
+    net = f"{root}/sys/class/net/eth1"
+    debugfs = f"{root}/sys/kernel/debug/lan865x/spi0.0"
+    for path in (spi_device, driver, net, debugfs, f"{root}/proc/sys/kernel/random"):
+        os.makedirs(path)
+    os.symlink(os.path.relpath(driver, spi_device), f"{spi_device}/driver")
+    os.symlink(os.path.relpath(spi_device, driver), f"{driver}/spi0.0")
+    os.symlink(os.path.relpath(spi_device, net), f"{net}/device")
+    with open(f"{net}/ifindex", 'w') as f:
+        f.write("3\n")
+    with open(f"{root}/proc/sys/kernel/random/boot_id", 'w') as f:
+        f.write("00000000-0000-0000-0000-000000000000\n")
+    # Register map only: without reg_access the tool does not wait on /dev/kmsg
+    with open(f"{debugfs}/registers", 'w') as f:
+        f.write(''.join(f"0x{address:08x}: 0x{address & 0xffff:08x}\n"
+                        for address in LAN8651_DUMP_REGISTERS))
+
+def run_python(args, env):
+    """Run python with args; returns (wall clock seconds, stderr)"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + args, env=env, cwd=SCRIPT_DIR,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr}")
+    return elapsed, result.stderr
+
+def import_time_us(env):
+    """Cumulative import time of lan8651_kernelfs as reported by -X importtime"""
+    _, stderr = run_python(['-X', 'importtime', '-c', 'import lan8651_kernelfs'], env)
+    for line in stderr.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == 'lan8651_kernelfs':
+            return int(fields[1])
+    raise RuntimeError("lan8651_kernelfs missing from -X importtime output")
+
+def bench_startup(iterations):
+    """Import and CLI start-up time against the budgets; returns False when over"""
+    print("\nCLI start-up (fake sysfs tree):")
+    ok = True
+
+    # Time the tool the way an installed copy runs: from cached bytecode
+    # (python3 -m lan8651_kernelfs). Run as a script, python recompiles the
+    # whole file every time; that is shown separately, without a budget.
+    py_compile.compile(f"{SCRIPT_DIR}/lan8651_kernelfs.py", doraise=True)
+    cli = ['-m', 'lan8651_kernelfs']
+
+    with tempfile.TemporaryDirectory() as root:
+        make_fake_sysfs(root)
+        env = dict(os.environ,
+                   LAN8651_SYSFS_ROOT=root,
+                   LAN8651_DISCOVERY_CACHE=f"{root}/discovery.json",
+                   LAN8651_SOCKET=f"{root}/lan8651d.sock")
+        env.pop('LAN8651_DEBUG', None)
+
+        imports = statistics.median(import_time_us(env) for _ in range(STARTUP_RUNS)) / 1000
+        over = imports > STARTUP_IMPORT_BUDGET_MS
+        ok = ok and not over
+        print(f"  {'import lan8651_kernelfs':<32} {imports:8.1f} ms "
+              f"(budget {STARTUP_IMPORT_BUDGET_MS} ms){'  OVER BUDGET' if over else ''}")
+
+        bare = statistics.median(run_python(['-c', 'pass'], env)[0]
+                                 for _ in range(STARTUP_RUNS)) * 1000
+        print(f"  {'python -c pass':<32} {bare:8.1f} ms")
+
+        # A register read resolves the device, so with the discovery cache
+        # removed it scans sysfs; the last run leaves the cache filled
+        command = STARTUP_COMMANDS[0]
+        cache = env['LAN8651_DISCOVERY_CACHE']
+        cold = []
+        for _ in range(STARTUP_RUNS):
+            if os.path.exists(cache):
+                os.unlink(cache)
+            cold.append(run_python(cli + command, env)[0])
+        cold = statistics.median(cold) * 1000 - bare
+        print(f"  {' '.join(command) + ' (no cache)':<32} {cold:8.1f} ms")
+
+        for command in STARTUP_COMMANDS:
+            elapsed = statistics.median(run_python(cli + command, env)[0]
+                                        for _ in range(STARTUP_RUNS)) * 1000 - bare
+            over = elapsed > STARTUP_COMMAND_BUDGET_MS
+            ok = ok and not over
+            print(f"  {' '.join(command):<32} {elapsed:8.1f} ms "
+                  f"(budget {STARTUP_COMMAND_BUDGET_MS} ms){'  OVER BUDGET' if over else ''}")
+
+        command = STARTUP_COMMANDS[0]
+        script = statistics.median(run_python(['lan8651_kernelfs.py'] + command, env)[0]
+                                   for _ in range(STARTUP_RUNS)) * 1000 - bare
+        print(f"  {' '.join(command) + ' (as script)':<32} {script:8.1f} ms")
+
+    if not ok:
+        print("  start-up budget exceeded")
+    return ok
+
+BENCHMARKS = {
+    'debugfs': bench_debugfs,
+    'tc6': bench_tc6,
+    'startup': bench_startup,
+}
+
+def main():
+    names = [arg for arg in sys.argv[1:] if not arg.isdigit()]
+    counts = [int(arg) for arg in sys.argv[1:] if arg.isdigit()]
+    iterations = counts[0] if counts else DEFAULT_ITERATIONS
+
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(unknown)}")
+        print(f"Available: {', '.join(BENCHMARKS)}")
+        return 1
+
+    # Keep per-access info logging out of the timings
+    lan8651_kernelfs.get_logger().setLevel('WARNING')
+
+    failed = [name for name in names or BENCHMARKS
+              if BENCHMARKS[name](iterations) is False]
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
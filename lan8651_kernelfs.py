@@ -6,65 +6,188 @@ This approach uses existing kernel infrastructure instead of
 creating a custom kernel module.
 """
 
+# Only modules needed by every command are imported here; the rest
+# (logging, asyncio, socket, select, subprocess, glob, json, ...) are
+# imported where they are used, to keep start-up of short CLI runs fast
+# (see 'lan8651_benchmark.py startup'). The daemon lives in lan8651d.py.
 import os
-import glob
+import errno
+import array
+import fcntl
 import struct
-import subprocess
+import bisect
 import sys
+import threading
 import time
-import logging
-import argparse
-from pathlib import Path
 
 # Debug output control
 DEBUG_ENABLED = os.environ.get('LAN8651_DEBUG', '0') == '1'
 
+# Register access types
+REG_RO = 'RO'                   # read-only
+REG_RW = 'RW'                   # read/write
+REG_W1C = 'W1C'                 # read, write 1 to clear
+
+# Register addresses are MMS << 16 | register (20 bits), values 32 bits
+REGISTER_ADDRESS_MAX = 0xFFFFF
+REGISTER_VALUE_MAX = 0xFFFFFFFF
+
+class RegisterInfo:
+    """Static attributes of one LAN8651 register
+    
+    width is the register width in bits (16 for the Clause 22 registers
+    in MMS 0, 32 otherwise). Volatile registers change without being
+    written or have read side effects. Registers with read side effects
+    (side_effects) are only read when asked for by address: never as part
+    of a register dump or a burst that merely covers them. reset is the
+    documented reset value, or None where it is not known.
+    """
+
+    def __init__(self, name, address, width, access, volatile, reset, description,
+                 side_effects=False):
+        self.name = name
+        self.address = address
+        self.width = width
+        self.access = access
+        self.volatile = volatile
+        self.reset = reset
+        self.description = description
+        self.side_effects = side_effects
+
+    def __repr__(self):
+        return f"RegisterInfo({self.name!r}, 0x{self.address:05X}, {self.width}, {self.access!r})"
+
+    @property
+    def writable(self):
+        return self.access != REG_RO
+
+    @property
+    def max_value(self):
+        return (1 << self.width) - 1
+
 # LAN8651 Register Definitions (from official datasheet)
-# MMS 0: Open Alliance Standard Registers
-LAN8651_REGISTERS = {
-    # Standard Control/Status Registers
-    'OA_ID': 0x0000,           # Open Alliance ID
-    'OA_PHYID': 0x0001,        # PHY Identification
-    'OA_STDCAP': 0x0002,       # Standard Capabilities
-    'OA_RESET': 0x0003,        # Reset Control
-    'OA_CONFIG0': 0x0004,      # Configuration 0
-    'OA_STATUS0': 0x0008,      # Status 0
-    'OA_STATUS1': 0x0009,      # Status 1
-    'OA_BUFSTS': 0x000B,       # Buffer Status
-    'OA_IMASK0': 0x000C,       # Interrupt Mask 0
-    'OA_IMASK1': 0x000D,       # Interrupt Mask 1
+# name, address, width, access, volatile, reset value, description
+LAN8651_REGISTER_TABLE = [
+    # MMS 0: Open Alliance Standard Registers
+    ('OA_ID',         0x0000,  32, REG_RO,  False, 0x00000011, "Open Alliance ID"),
+    ('OA_PHYID',      0x0001,  32, REG_RO,  False, None,       "PHY Identification"),
+    ('OA_STDCAP',     0x0002,  32, REG_RO,  False, None,       "Standard Capabilities"),
+    ('OA_RESET',      0x0003,  32, REG_RW,  True,  0x00000000, "Reset Control"),
+    ('OA_CONFIG0',    0x0004,  32, REG_RW,  False, None,       "Configuration 0"),
+    ('OA_STATUS0',    0x0008,  32, REG_W1C, True,  None,       "Status 0"),
+    ('OA_STATUS1',    0x0009,  32, REG_W1C, True,  None,       "Status 1"),
+    ('OA_BUFSTS',     0x000B,  32, REG_RO,  True,  None,       "Buffer Status"),
+    ('OA_IMASK0',     0x000C,  32, REG_RW,  False, None,       "Interrupt Mask 0"),
+    ('OA_IMASK1',     0x000D,  32, REG_RW,  False, None,       "Interrupt Mask 1"),
     
     # Timestamp Capture Registers
-    'TTSCAH': 0x0010,          # TX Timestamp Capture A High
-    'TTSCAL': 0x0011,          # TX Timestamp Capture A Low
-    'TTSCBH': 0x0012,          # TX Timestamp Capture B High
-    'TTSCBL': 0x0013,          # TX Timestamp Capture B Low
-    'TTSCCH': 0x0014,          # TX Timestamp Capture C High
-    'TTSCCL': 0x0015,          # TX Timestamp Capture C Low
+    ('TTSCAH',        0x0010,  32, REG_RO,  True,  0x00000000, "TX Timestamp Capture A High"),
+    ('TTSCAL',        0x0011,  32, REG_RO,  True,  0x00000000, "TX Timestamp Capture A Low"),
+    ('TTSCBH',        0x0012,  32, REG_RO,  True,  0x00000000, "TX Timestamp Capture B High"),
+    ('TTSCBL',        0x0013,  32, REG_RO,  True,  0x00000000, "TX Timestamp Capture B Low"),
+    ('TTSCCH',        0x0014,  32, REG_RO,  True,  0x00000000, "TX Timestamp Capture C High"),
+    ('TTSCCL',        0x0015,  32, REG_RO,  True,  0x00000000, "TX Timestamp Capture C Low"),
     
     # Clause 22 Basic Control/Status
-    'BASIC_CONTROL': 0xFF00,   # Basic Control Register
-    'BASIC_STATUS': 0xFF01,    # Basic Status Register
-    'PHY_ID1': 0xFF02,         # PHY Identifier 1
-    'PHY_ID2': 0xFF03,         # PHY Identifier 2
-    'MMDCTRL': 0xFF0D,         # MMD Access Control
-    'MMDAD': 0xFF0E,           # MMD Access Address/Data
+    ('BASIC_CONTROL', 0xFF00,  16, REG_RW,  False, None,       "Basic Control Register"),
+    ('BASIC_STATUS',  0xFF01,  16, REG_RO,  True,  None,       "Basic Status Register"),
+    ('PHY_ID1',       0xFF02,  16, REG_RO,  False, 0x0007,     "PHY Identifier 1"),
+    ('PHY_ID2',       0xFF03,  16, REG_RO,  False, None,       "PHY Identifier 2"),
+    ('MMDCTRL',       0xFF0D,  16, REG_RW,  False, 0x0000,     "MMD Access Control"),
+    ('MMDAD',         0xFF0E,  16, REG_RW,  True,  0x0000,     "MMD Access Address/Data"),
     
     # MMS 1: MAC Registers
-    'MAC_NCR': 0x10000,        # MAC Network Control
-    'MAC_NCFGR': 0x10001,      # MAC Network Configuration
-    'MAC_HRB': 0x10020,        # MAC Hash Register Bottom
-    'MAC_HRT': 0x10021,        # MAC Hash Register Top
-    'MAC_SAB1': 0x10022,       # MAC Specific Address 1 Bottom
-    'MAC_SAT1': 0x10023,       # MAC Specific Address 1 Top
-    'MAC_SAB2': 0x10024,       # MAC Specific Address 2 Bottom
-    'MAC_SAT2': 0x10025,       # MAC Specific Address 2 Top
-    'BMGR_CTL': 0x10200,       # Buffer Manager Control
-    'STATS0': 0x10208,         # Statistics 0
-    'STATS1': 0x10209,         # Statistics 1
-    'STATS2': 0x1020A,         # Statistics 2
+    ('MAC_NCR',       0x10000, 32, REG_RW,  False, 0x00000000, "MAC Network Control"),
+    ('MAC_NCFGR',     0x10001, 32, REG_RW,  False, None,       "MAC Network Configuration"),
+    ('MAC_HRB',       0x10020, 32, REG_RW,  False, 0x00000000, "MAC Hash Register Bottom"),
+    ('MAC_HRT',       0x10021, 32, REG_RW,  False, 0x00000000, "MAC Hash Register Top"),
+    ('MAC_SAB1',      0x10022, 32, REG_RW,  False, 0x00000000, "MAC Specific Address 1 Bottom"),
+    ('MAC_SAT1',      0x10023, 32, REG_RW,  False, 0x00000000, "MAC Specific Address 1 Top"),
+    ('MAC_SAB2',      0x10024, 32, REG_RW,  False, 0x00000000, "MAC Specific Address 2 Bottom"),
+    ('MAC_SAT2',      0x10025, 32, REG_RW,  False, 0x00000000, "MAC Specific Address 2 Top"),
+    ('MAC_SAB3',      0x10026, 32, REG_RW,  False, 0x00000000, "MAC Specific Address 3 Bottom"),
+    ('MAC_SAT3',      0x10027, 32, REG_RW,  False, 0x00000000, "MAC Specific Address 3 Top"),
+    ('MAC_SAB4',      0x10028, 32, REG_RW,  False, 0x00000000, "MAC Specific Address 4 Bottom"),
+    ('MAC_SAT4',      0x10029, 32, REG_RW,  False, 0x00000000, "MAC Specific Address 4 Top"),
+    ('BMGR_CTL',      0x10200, 32, REG_RW,  True,  0x00000000, "Buffer Manager Control"),
+    ('STATS0',        0x10208, 32, REG_RO,  True,  0x00000000, "Statistics 0"),
+    ('STATS1',        0x10209, 32, REG_RO,  True,  0x00000000, "Statistics 1"),
+    ('STATS2',        0x1020A, 32, REG_RO,  True,  0x00000000, "Statistics 2"),
+    ('STATS3',        0x1020B, 32, REG_RO,  True,  0x00000000, "Statistics 3"),
+    ('STATS4',        0x1020C, 32, REG_RO,  True,  0x00000000, "Statistics 4"),
+    ('STATS5',        0x1020D, 32, REG_RO,  True,  0x00000000, "Statistics 5"),
+    ('STATS6',        0x1020E, 32, REG_RO,  True,  0x00000000, "Statistics 6"),
+    ('STATS7',        0x1020F, 32, REG_RO,  True,  0x00000000, "Statistics 7"),
+    ('STATS8',        0x10210, 32, REG_RO,  True,  0x00000000, "Statistics 8"),
+    ('STATS9',        0x10211, 32, REG_RO,  True,  0x00000000, "Statistics 9"),
+    ('STATS10',       0x10212, 32, REG_RO,  True,  0x00000000, "Statistics 10"),
+    ('STATS11',       0x10213, 32, REG_RO,  True,  0x00000000, "Statistics 11"),
+    ('STATS12',       0x10214, 32, REG_RO,  True,  0x00000000, "Statistics 12"),
+]
+
+# Registers whose read has side effects: reading MMDAD performs the MMD
+# access set up in MMDCTRL (the kernel patch leaves it out of its dumps too)
+LAN8651_SIDE_EFFECT_REGISTER_NAMES = ('MMDAD',)
+
+LAN8651_REGISTER_INFO = {entry[0]: RegisterInfo(*entry, side_effects=entry[0] in
+                                                LAN8651_SIDE_EFFECT_REGISTER_NAMES)
+                         for entry in LAN8651_REGISTER_TABLE}
+LAN8651_REGISTER_INFO_BY_ADDRESS = {info.address: info for info in LAN8651_REGISTER_INFO.values()}
+
+# Name -> address
+LAN8651_REGISTERS = {name: info.address for name, info in LAN8651_REGISTER_INFO.items()}
+
+# Registers whose value changes without being written (status, buffer
+# levels, captured timestamps, counters) or whose read has side effects.
+# These are never served from a cached register dump.
+LAN8651_VOLATILE_REGISTERS = {info.address for info in LAN8651_REGISTER_INFO.values()
+                              if info.volatile}
+
+# Registers with read side effects: never dumped, never merged into bursts
+LAN8651_SIDE_EFFECT_REGISTERS = {info.address for info in LAN8651_REGISTER_INFO.values()
+                                 if info.side_effects}
+
+# Registers read by a full dump
+LAN8651_DUMP_REGISTERS = [address for address in LAN8651_REGISTERS.values()
+                          if address not in LAN8651_SIDE_EFFECT_REGISTERS]
+
+# Bits that clear themselves after being written as 1; they are masked out
+# of the value kept in the shadow register cache
+LAN8651_SELF_CLEARING_BITS = {
+    LAN8651_REGISTERS['BASIC_CONTROL']: (1 << 15) | (1 << 9),   # RESET, ANRESTART
 }
 
+# Configuration registers the lan865x driver (and phylib) write on their
+# own: TXEN/RXEN in MAC_NCR on open/stop, MAC_NCFGR and the hash registers
+# from the multicast work, MAC_SAB1/SAT1 on a MAC address change, and
+# BASIC_CONTROL on link configuration
+LAN8651_DRIVER_WRITTEN_REGISTERS = {LAN8651_REGISTERS[name] for name in (
+    'MAC_NCR', 'MAC_NCFGR', 'MAC_HRB', 'MAC_HRT', 'MAC_SAB1', 'MAC_SAT1', 'BASIC_CONTROL')}
+
+# Driver-written registers the reg_access rmw command is atomic for: their
+# driver writers run under RTNL, which rmw holds. The multicast work writes
+# MAC_NCFGR/MAC_HRB/MAC_HRT without any lock and phylib writes
+# BASIC_CONTROL under phydev->lock, so rmw can race with those.
+LAN8651_RMW_ATOMIC_REGISTERS = {LAN8651_REGISTERS[name] for name in (
+    'MAC_NCR', 'MAC_SAB1', 'MAC_SAT1')}
+
+# Registers served from the shadow cache: configuration registers that
+# only change when we write them
+LAN8651_SHADOW_REGISTERS = (set(LAN8651_REGISTERS.values()) - LAN8651_VOLATILE_REGISTERS -
+                            LAN8651_DRIVER_WRITTEN_REGISTERS)
+
+# Default maximum age (seconds) of a cached ethtool register dump
+ETHTOOL_SNAPSHOT_MAX_AGE = 0.05
+
+# Seconds a register access method that failed is skipped before it is
+# probed again
+BACKEND_RETRY_INTERVAL = 30.0
+
+# Returned by a register access method that works but does not provide
+# the requested register(s), e.g. an address missing from a register dump;
+# unlike None it does not count as a failure of the method
+NOT_AVAILABLE = type('NotAvailable', (), {'__repr__': lambda self: 'NOT_AVAILABLE'})()
+
 # Register bit definitions
 LAN8651_STATUS0_BITS = {
     'PHYINT': (1 << 7),        # PHY Interrupt
@@ -96,34 +219,196 @@ LAN8651_BASIC_STATUS_BITS = {
     'ERCAP': (1 << 0),         # Extended Register Capable
 }
 
-# Setup logging
-logging.basicConfig(
-    level=logging.DEBUG if DEBUG_ENABLED else logging.INFO,
-    format='[%(asctime)s.%(msecs)03d] %(levelname)s %(funcName)s:%(lineno)d: %(message)s',
-    datefmt='%H:%M:%S'
-)
-logger = logging.getLogger(__name__)
+# SIOCETHTOOL interface, matching lan8651_ethtool.c
+SIOCETHTOOL = 0x8946
+ETHTOOL_GDRVINFO = 0x00000003
+ETHTOOL_GREGS = 0x00000004
+ETHTOOL_GLANREG = 0x00001000    # Get LAN register
+ETHTOOL_SLANREG = 0x00001001    # Set LAN register
+IFNAMSIZ = 16
+IFREQ_SIZE = 40                 # sizeof(struct ifreq), large enough for 32/64-bit
+LAN8651_REG_ACCESS = struct.Struct('=III')   # struct lan8651_reg_access
+ETHTOOL_DRVINFO_SIZE = 196      # sizeof(struct ethtool_drvinfo)
+ETHTOOL_REGS_HEADER = struct.Struct('=III')  # struct ethtool_regs: cmd, version, len
+ETHTOOL_DRVINFO_DRIVER = slice(4, 36)        # char driver[32]
+ETHTOOL_DRVINFO_BUS_INFO = slice(100, 132)   # char bus_info[32]
+
+# rtnetlink (linux/netlink.h, linux/rtnetlink.h, linux/if_link.h)
+NETLINK_ROUTE = 0
+NLMSG_HEADER = struct.Struct('=IHHII')       # len, type, flags, seq, pid
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x001
+NLM_F_DUMP = 0x300
+NLA_HEADER = struct.Struct('=HH')            # len, type
+NLA_TYPE_MASK = 0x3fff
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_GETLINK = 18
+IFINFOMSG = struct.Struct('=BxHiII')         # family, type, index, flags, change
+IFLA_IFNAME = 3
+IFLA_PARENT_DEV_NAME = 56                    # Linux 5.18+
+IFLA_PARENT_DEV_BUS_NAME = 57
+RTNLGRP_LINK = 1
+ARPHRD_ETHER = 1
+NETLINK_RECV_SIZE = 65536
+
+# How find_lan865x_devices() lists interfaces: 'netlink' (one RTM_GETLINK
+# dump, falling back to sysfs) or 'sysfs' (driver symlink of every interface)
+DISCOVERY_MODE = os.environ.get('LAN8651_DISCOVERY', 'netlink')
+
+# OPEN Alliance TC6 control transactions
+TC6_HEADER_WNR = 1 << 29        # Write, not read
+TC6_HEADER_HDRB = 1 << 30       # Header bad (set by the MAC-PHY in the echo)
+TC6_MAX_BURST = 128             # 7-bit LEN field encodes count - 1
+
+# spidev full-duplex transfer (struct spi_ioc_transfer, SPI_IOC_MESSAGE(1))
+SPI_IOC_TRANSFER = struct.Struct('=QQIIHBBBBBB')
+SPI_IOC_MESSAGE_1 = 0x40206B00
+SPIDEV_SPEED_HZ = 15000000
+
+# Kernel log interface for reg_access results ("REG READ 0x... = 0x...")
+KMSG_PATH = "/dev/kmsg"
+KMSG_REG_READ = r'REG READ 0x([0-9a-fA-F]+) = 0x([0-9a-fA-F]+)'
+KMSG_REPLY_TIMEOUT = 0.1        # seconds to wait for the dev_info record
+
+# "read <addr> <count>" on reg_access: registers per command (matches
+# LAN865X_DEBUGFS_MAX_COUNT in the patch) and reply size for a full range
+REG_ACCESS_MAX_COUNT = 64
+REG_ACCESS_RESULT_SIZE = REG_ACCESS_MAX_COUNT * 24
+
+# Reply of "rmw <addr> <mask> <value>" on reg_access (read-modify-write
+# done by the driver under RTNL, see LAN8651_RMW_ATOMIC_REGISTERS):
+# address, old value, new value
+REG_ACCESS_RMW_REPLY = r'rmw 0x([0-9a-fA-F]+): 0x([0-9a-fA-F]+) -> 0x([0-9a-fA-F]+)'
+
+# Read buffer for the whole debugfs "registers" map (one line per register)
+DEBUGFS_REGISTERS_SIZE = 16384
+
+# Root prefix of the /sys and /proc paths used for device discovery, so the
+# tool can run against a fake tree (start-up benchmark); empty normally
+SYSFS_ROOT = os.environ.get('LAN8651_SYSFS_ROOT', "")
+SYS_CLASS_NET = f"{SYSFS_ROOT}/sys/class/net"
+DEBUGFS_ROOT = f"{SYSFS_ROOT}/sys/kernel/debug"
+
+# Boot-scoped cache of device discovery results, so a start-up does not
+# have to scan every network interface. LAN8651_DISCOVERY_CACHE= (empty)
+# disables it; the default is in /run, or /tmp for unprivileged users.
+# The SPI devices bound to the driver are recorded with it, so a device
+# that was probed after the cache was written invalidates it.
+BOOT_ID_PATH = f"{SYSFS_ROOT}/proc/sys/kernel/random/boot_id"
+LAN865X_DRIVER_DIR = f"{SYSFS_ROOT}/sys/bus/spi/drivers/lan865x"
+DISCOVERY_CACHE = os.environ.get(
+    'LAN8651_DISCOVERY_CACHE',
+    "/run/lan8651-discovery.json" if os.access("/run", os.W_OK)
+    else f"/tmp/lan8651-discovery-{os.getuid()}.json")
+
+# Directory for the per-device lock files that serialise command/response
+# sequences between processes (falls back to the temp directory)
+LOCK_DIR = "/run/lock"
+
+# lan8651d: Unix socket of the resident daemon and its message framing.
+# SOCK_SEQPACKET keeps message boundaries, so a message is just a header
+# (op or status, entry count, device name length), the device name (empty
+# for the default device) and fixed-size entries.
+DAEMON_SOCKET = os.environ.get('LAN8651_SOCKET', "/run/lan8651d.sock")
+DAEMON_MAX_MESSAGE = 65536
+DAEMON_HEADER = struct.Struct('!BHB')
+DAEMON_OP_READ = 1              # entries: address -> valid, value
+DAEMON_OP_WRITE = 2             # entries: address, value -> ok
+DAEMON_OP_DUMP = 3              # no entries -> address, value
+DAEMON_OP_LIST = 4              # no entries -> "iface spi_device" lines
+DAEMON_OP_WRITE_VERIFY = 5      # as DAEMON_OP_WRITE, with read-back verification
+DAEMON_ADDRESS = struct.Struct('!I')
+DAEMON_PAIR = struct.Struct('!II')
+DAEMON_READ_RESULT = struct.Struct('!?I')
+DAEMON_WRITE_RESULT = struct.Struct('!?')
+DAEMON_STATUS_OK = 0
+DAEMON_STATUS_ERROR = 1
+
+# Worker threads used by AsyncLAN8651 for blocking backend calls
+ASYNC_MAX_WORKERS = 4
+
+# errno values meaning a held-open debugfs file belongs to a removed driver
+# instance and has to be reopened
+DEBUGFS_REOPEN_ERRNOS = {errno.ENOENT, errno.ENODEV, errno.EBADF, errno.EIO, errno.ESTALE}
+
+# Module logger, created by get_logger() on the first message
+logger = None
+
+def setup_logging():
+    """Configure log output for the command line tools (done by main())"""
+    import logging
+    logging.basicConfig(
+        level=logging.DEBUG if DEBUG_ENABLED else logging.INFO,
+        format='[%(asctime)s.%(msecs)03d] %(levelname)s %(funcName)s:%(lineno)d: %(message)s',
+        datefmt='%H:%M:%S'
+    )
+
+def get_logger():
+    """Get the module logger, importing logging on first use"""
+    global logger
+    if logger is None:
+        import logging
+        logger = logging.getLogger(__name__)
+    return logger
 
 def debug_print(msg, *args):
     """Print debug message if debug is enabled"""
     if DEBUG_ENABLED:
-        logger.debug(msg, *args)
+        get_logger().debug(msg, *args)
         
 def info_print(msg, *args):
     """Print info message"""
-    logger.info(msg, *args)
+    get_logger().info(msg, *args)
 
 def error_print(msg, *args):
     """Print error message"""
-    logger.error(msg, *args)
+    get_logger().error(msg, *args)
 
 def get_register_name(addr):
     """Get register name from address"""
-    for name, address in LAN8651_REGISTERS.items():
-        if address == addr:
-            return name
+    info = LAN8651_REGISTER_INFO_BY_ADDRESS.get(addr)
+    if info:
+        return info.name
     return f"0x{addr:04X}"
 
+def get_register_info(addr):
+    """Get the RegisterInfo of an address, or None for unknown registers"""
+    return LAN8651_REGISTER_INFO_BY_ADDRESS.get(addr)
+
+def check_register_write(address, value):
+    """Check a write against the register metadata before it goes on the bus
+    
+    Returns an error message, or None if the write is allowed. Writes to
+    unknown registers are only checked against the address and value range.
+    """
+    if not 0 <= address <= REGISTER_ADDRESS_MAX:
+        return f"address {address:#x} is outside the 20-bit register space"
+    if not 0 <= value <= REGISTER_VALUE_MAX:
+        return f"{value:#x} does not fit in a 32-bit register"
+    info = get_register_info(address)
+    if info is None:
+        return None
+    if not info.writable:
+        return f"{info.name} is read-only"
+    if not 0 <= value <= info.max_value:
+        return f"0x{value:x} does not fit in {info.width}-bit register {info.name}"
+    return None
+
+def register_verifiable(address):
+    """Check whether a written value can be expected to read back unchanged"""
+    info = get_register_info(address)
+    return info is None or not (info.volatile or info.access == REG_W1C)
+
+def register_readback_matches(address, written, readback):
+    """Check a read-back value against the value written, ignoring
+    self-clearing bits (which read back as 0 once done)"""
+    if readback is None:
+        return False
+    keep = ~LAN8651_SELF_CLEARING_BITS.get(address, 0)
+    return readback & keep == written & keep
+
 def parse_register_address(addr_str):
     """Parse register address from string (name or hex)"""
     # Try to parse as register name first
@@ -133,11 +418,24 @@ def parse_register_address(addr_str):
     # Try to parse as hex address
     try:
         if addr_str.startswith('0x') or addr_str.startswith('0X'):
-            return int(addr_str, 16)
+            address = int(addr_str, 16)
         else:
-            return int(addr_str, 16)
+            address = int(addr_str, 16)
     except ValueError:
         raise ValueError(f"Invalid register address: {addr_str}")
+    if not 0 <= address <= REGISTER_ADDRESS_MAX:
+        raise ValueError(f"Register address out of range (0..0x{REGISTER_ADDRESS_MAX:X}): {addr_str}")
+    return address
+
+def parse_register_value(value_str):
+    """Parse a register value from string (hex with 0x, or decimal)"""
+    try:
+        value = int(value_str, 0)
+    except ValueError:
+        raise ValueError(f"Invalid register value: {value_str}")
+    if not 0 <= value <= REGISTER_VALUE_MAX:
+        raise ValueError(f"Register value out of range (0..0x{REGISTER_VALUE_MAX:X}): {value_str}")
+    return value
 
 def decode_register_bits(addr, value):
     """Decode register bits for known registers"""
@@ -164,304 +462,2836 @@ def decode_register_bits(addr, value):
     
     return None
 
-class LAN8651Debugfs:
-    def __init__(self):
-        debug_print("Initializing LAN8651Debugfs class")
-        self.debugfs_path = None
-        self.sysfs_path = None
-        debug_print("Starting interface detection")
-        self.find_interfaces()
-        debug_print("Initialization complete: debugfs_path=%s, sysfs_path=%s", 
-                   self.debugfs_path, self.sysfs_path)
+class RegisterBackend:
+    """One register access method in the LAN8651Debugfs fallback chain
     
-    def find_interfaces(self):
-        """Find LAN8651 network interfaces via sysfs"""
-        
-        debug_print("Starting interface search")
-        
-        # Look for network interfaces using lan865x driver
-        net_device_pattern = "/sys/class/net/*/device/driver"
-        debug_print("Searching for network devices with pattern: %s", net_device_pattern)
-        net_devices = glob.glob(net_device_pattern)
-        debug_print("Found %d network device entries", len(net_devices))
-        
-        for i, device_path in enumerate(net_devices):
-            debug_print("[%d/%d] Processing device: %s", i+1, len(net_devices), device_path)
-            try:
-                # Read the driver name
-                debug_print("Reading driver link for: %s", device_path)
-                driver_link = os.readlink(device_path)
-                debug_print("Driver link target: %s", driver_link)
-                
-                if "lan865x" in driver_link:
-                    # Found a LAN8651 interface
-                    iface_name = device_path.split('/')[-3]
-                    debug_print("Found LAN865x driver! Interface: %s", iface_name)
-                    self.sysfs_path = f"/sys/class/net/{iface_name}/device"
-                    info_print("Found LAN8651 interface: %s", iface_name)
-                    debug_print("Set sysfs_path to: %s", self.sysfs_path)
-                    break
-                else:
-                    debug_print("Driver '%s' is not lan865x, skipping", driver_link)
-            except OSError as e:
-                debug_print("OSError reading %s: %s", device_path, e)
-                continue
-        else:
-            debug_print("No LAN865x interfaces found in sysfs")
+    read(address) returns the value, NOT_AVAILABLE if the method does not
+    provide that register, or None on failure. read_many(addresses), if the
+    method can serve several registers in one transaction, returns a dict
+    of the values it found (NOT_AVAILABLE if none of them is provided, None
+    on failure). write(address, value),
+    for methods that can write, returns True or None on failure;
+    write_many(values) writes an address -> value dict in its order, in as
+    few transactions as the method allows, and returns how many of the
+    leading entries were written (None or 0 if none).
+    """
+
+    def __init__(self, name, read, read_many=None, write=None, write_many=None):
+        self.name = name
+        self.read = read
+        self.read_many = read_many
+        self.write = write
+        self.write_many = write_many
+
+    def read_batch(self, addresses):
+        """Read several registers, one by one unless read_many is available"""
+        if self.read_many:
+            return self.read_many(addresses) or None
+        values = {}
+        unavailable = 0
+        for address in addresses:
+            value = self.read(address)
+            if value is NOT_AVAILABLE:
+                unavailable += 1
+            elif value is not None:
+                values[address] = value
+        if not values and unavailable == len(addresses):
+            return NOT_AVAILABLE
+        return values or None
+
+    def write_batch(self, values):
+        """Write several registers in order, one by one unless write_many is available
         
-        # Look for debugfs entries
-        debug_print("Searching for debugfs entries")
-        if os.path.exists("/sys/kernel/debug"):
-            debug_print("Debugfs is mounted at /sys/kernel/debug")
-            # Check for TC6 or lan865x specific debug entries
-            debug_paths = [
-                "/sys/kernel/debug/tc6",
-                "/sys/kernel/debug/lan865x",
-                "/sys/kernel/debug/spi"
-            ]
-            
-            debug_print("Checking %d potential debug paths", len(debug_paths))
-            for i, path in enumerate(debug_paths):
-                debug_print("[%d/%d] Checking debugfs path: %s", i+1, len(debug_paths), path)
-                if os.path.exists(path):
-                    debug_print("Found debugfs entry: %s", path)
-                    self.debugfs_path = path
-                    info_print("Found debugfs interface: %s", path)
-                    
-                    # List contents for debugging
-                    try:
-                        contents = os.listdir(path)
-                        debug_print("Debugfs contents: %s", contents)
-                    except PermissionError as e:
-                        debug_print("Permission denied listing %s: %s", path, e)
-                    break
-                else:
-                    debug_print("Debugfs path does not exist: %s", path)
-        else:
-            debug_print("Debugfs is not mounted at /sys/kernel/debug")
-            error_print("Debugfs not available - kernel may need CONFIG_DEBUG_FS=y")
+        Returns the number of leading entries written, or None if none.
+        """
+        if self.write_many:
+            return self.write_many(values) or None
+        done = 0
+        for address, value in values.items():
+            if not self.write(address, value):
+                break
+            done += 1
+        return done or None
+
+    def __repr__(self):
+        return f"RegisterBackend({self.name!r})"
+
+class RegisterDump:
+    """Address-indexed view of a raw ETHTOOL_GREGS register blob
     
-    def read_via_debugfs(self, address):
-        """Try to read register via debugfs if available"""
-        
-        if not self.debugfs_path:
-            return None
-        
-        # This would depend on what the kernel driver exposes
-        reg_file = f"{self.debugfs_path}/registers"
-        if os.path.exists(reg_file):
-            try:
-                with open(reg_file, 'w') as f:
-                    f.write(f"0x{address:08x}")
-                
-                with open(reg_file, 'r') as f:
-                    result = f.read().strip()
-                    return int(result, 0)
-            except Exception as e:
-                print(f"Debugfs read error: {e}")
-        
+    The blob holds native-endian u32 (address, value) pairs in ascending
+    address order. It is not copied: addresses and values are strided
+    views of the same buffer and lookups bisect the address view.
+    """
+
+    def __init__(self, blob):
+        blob = memoryview(blob)
+        words = blob[:len(blob) - len(blob) % 8].cast('I')
+        self.addresses = words[0::2]
+        self.values = words[1::2]
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __contains__(self, address):
+        return self.get(address) is not None
+
+    def get(self, address):
+        """Get the value of a register, or None if it is not in the dump"""
+        i = bisect.bisect_left(self.addresses, address)
+        if i < len(self.addresses) and self.addresses[i] == address:
+            return self.values[i]
         return None
+
+    def items(self):
+        """Iterate over (address, value) pairs in address order"""
+        return zip(self.addresses, self.values)
+
+class TC6Error(IOError):
+    """A TC6 control transaction was rejected or echoed back corrupted"""
+
+def tc6_parity(word):
+    """Get the TC6 header parity bit: odd parity over bits 31:1"""
+    return 0 if bin(word >> 1).count('1') % 2 else 1
+
+def tc6_control_header(address, count, write=False):
+    """Build the 32-bit TC6 control header for count registers at address
     
-    def read_via_spi_debug(self, address):
-        """Try to access SPI debug information"""
-        
-        if not self.sysfs_path:
-            return None
-        
-        # Check if there are SPI device attributes we can use
-        spi_attrs = glob.glob(f"{self.sysfs_path}/spi*/registers") 
-        if spi_attrs:
-            try:
-                with open(spi_attrs[0], 'w') as f:
-                    f.write(f"read 0x{address:08x}")
-                
-                with open(spi_attrs[0], 'r') as f:
-                    result = f.read().strip()
-                    # Parse result - format depends on kernel implementation
-                    if "=" in result:
-                        value_str = result.split("=")[1].strip()
-                        return int(value_str, 0)
-            except Exception as e:
-                print(f"SPI debug read error: {e}")
-        
-        return None
+    The address uses this tool's convention: MMS in bits 19:16, register
+    address in bits 15:0.
+    """
+    if not 1 <= count <= TC6_MAX_BURST:
+        raise ValueError(f"TC6 burst length must be 1..{TC6_MAX_BURST}, got {count}")
+    header = (TC6_HEADER_WNR if write else 0) | \
+             (((address >> 16) & 0xF) << 24) | \
+             ((address & 0xFFFF) << 8) | \
+             ((count - 1) << 1)
+    return header | tc6_parity(header)
+
+def tc6_parse_header(header):
+    """Split a TC6 control header into (address, count, write)"""
+    address = (((header >> 24) & 0xF) << 16) | ((header >> 8) & 0xFFFF)
+    return address, ((header >> 1) & 0x7F) + 1, bool(header & TC6_HEADER_WNR)
+
+def plan_burst_reads(addresses, max_burst=TC6_MAX_BURST):
+    """Group addresses into runs of consecutive registers for burst reads
     
-    def read_via_ethtool(self, iface, address):
-        """Try to read via ethtool register dump"""
+    Returns a list of (start address, count) in address order. A run never
+    crosses a memory map (MMS) boundary and is at most max_burst long.
+    Registers with read side effects are always read on their own.
+    """
+    runs = []
+    for address in sorted(set(addresses)):
+        if runs:
+            start, count = runs[-1]
+            if (address == start + count and address >> 16 == start >> 16
+                    and count < max_burst
+                    and address not in LAN8651_SIDE_EFFECT_REGISTERS
+                    and start not in LAN8651_SIDE_EFFECT_REGISTERS):
+                runs[-1] = (start, count + 1)
+                continue
+        runs.append((address, 1))
+    return runs
+
+def plan_burst_writes(values, max_burst=TC6_MAX_BURST):
+    """Group an address -> value dict into burst writes, keeping its order
+    
+    Returns a list of (start address, values). Only entries that follow
+    each other in the dict and have consecutive addresses share a burst,
+    so the writes reach the device in the order given.
+    """
+    runs = []
+    for address, value in values.items():
+        if runs:
+            start, run = runs[-1]
+            if (address == start + len(run) and address >> 16 == start >> 16
+                    and len(run) < max_burst):
+                run.append(value)
+                continue
+        runs.append((address, [value]))
+    return runs
+
+class TC6Transport:
+    """Full-duplex byte transport underneath TC6Backend
+    
+    transfer(tx) clocks out tx and returns the same number of bytes
+    received. Implementations: SpidevTransport (hardware) and
+    TC6Simulator (in-process).
+    """
+
+    def transfer(self, tx):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class SpidevTransport(TC6Transport):
+    """TC6 transport over a /dev/spidevX.Y character device"""
+
+    def __init__(self, path, speed_hz=SPIDEV_SPEED_HZ):
+        self.path = path
+        self.speed_hz = speed_hz
+        self.fd = os.open(path, os.O_RDWR)
+        debug_print("Opened %s (fd=%d, %d Hz)", path, self.fd, speed_hz)
+
+    def transfer(self, tx):
+        tx_buf = array.array('B', tx)
+        rx_buf = array.array('B', bytes(len(tx)))
+        xfer = SPI_IOC_TRANSFER.pack(tx_buf.buffer_info()[0], rx_buf.buffer_info()[0],
+                                     len(tx), self.speed_hz, 0, 8, 0, 0, 0, 0, 0)
+        fcntl.ioctl(self.fd, SPI_IOC_MESSAGE_1, xfer)
+        return rx_buf.tobytes()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+class TC6Simulator(TC6Transport):
+    """In-process MAC-PHY answering TC6 control transactions
+    
+    Registers live in a plain dict (address -> value); unknown registers
+    read as 0. Used to exercise and benchmark TC6Backend without hardware.
+    """
+
+    def __init__(self, registers=None):
+        self.registers = dict(registers or {})
+        self.transactions = 0
+
+    def transfer(self, tx):
+        self.transactions += 1
+        header, = struct.unpack_from('>I', tx)
+        address, count, write = tc6_parse_header(header)
         
-        try:
-            # Use ethtool to dump registers
-            result = subprocess.run(['ethtool', '-d', iface], 
-                                  capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                # Parse ethtool output for our register
-                lines = result.stdout.split('\n')
-                for line in lines:
-                    if f"0x{address:08x}" in line.lower():
-                        # Extract value from line
-                        parts = line.split()
-                        for i, part in enumerate(parts):
-                            if f"0x{address:08x}" in part.lower() and i+1 < len(parts):
-                                return int(parts[i+1], 0)
-        except Exception as e:
-            print(f"Ethtool error: {e}")
+        if tc6_parity(header) != (header & 1) or len(tx) != 8 + 4 * count:
+            # Bad header: echo it with HDRB set and no data
+            return bytes(4) + struct.pack('>I', header | TC6_HEADER_HDRB) + bytes(len(tx) - 8)
         
-        return None
+        if write:
+            values = struct.unpack_from(f'>{count}I', tx, 4)
+            for i, value in enumerate(values):
+                self.registers[address + i] = value
+        else:
+            values = [self.registers.get(address + i, 0) for i in range(count)]
+        return bytes(4) + struct.pack(f'>I{count}I', header, *values)
+
+class TC6Backend:
+    """Register access speaking the TC6 control protocol over a transport
     
-    def read_register(self, address):
-        """Try multiple methods to read register"""
-        
-        reg_name = get_register_name(address)
-        debug_print("Attempting to read register %s (0x%08x)", reg_name, address)
+    Only unprotected mode (OA_CONFIG0.PROTE = 0) is supported.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.transactions = 0
+        # Transactions avoided by merging reads into bursts
+        self.transactions_saved = 0
+
+    def transaction(self, address, count, values=None):
+        """Run one control transaction and return the register data words"""
         
-        # Method 1: debugfs
-        value = self.read_via_debugfs(address)
-        if value is not None:
-            info_print("Read via debugfs: %s = 0x%08x", reg_name, value)
-            return value
+        write = values is not None
+        header = tc6_control_header(address, count, write)
+        payload = struct.pack(f'>{count}I', *values) if write else bytes(4 * count)
+        tx = struct.pack('>I', header) + payload + bytes(4)
         
-        # Method 2: SPI debug
-        value = self.read_via_spi_debug(address)
-        if value is not None:
-            info_print("Read via SPI debug: %s = 0x%08x", reg_name, value)
-            return value
+        rx = self.transport.transfer(tx)
+        self.transactions += 1
         
-        # Method 3: Find network interface and try ethtool
-        if self.sysfs_path:
-            iface = self.sysfs_path.split('/')[-2]
-            value = self.read_via_ethtool(iface, address)
-            if value is not None:
-                info_print("Read via ethtool: %s = 0x%08x", reg_name, value)
-                return value
+        if len(rx) != len(tx):
+            raise TC6Error(f"Short TC6 reply: {len(rx)} of {len(tx)} bytes")
+        echo, = struct.unpack_from('>I', rx, 4)
+        if echo & TC6_HEADER_HDRB:
+            raise TC6Error(f"MAC-PHY rejected TC6 header 0x{header:08x}")
+        if echo != header:
+            raise TC6Error(f"TC6 header echo mismatch: sent 0x{header:08x}, got 0x{echo:08x}")
         
-        error_print("All read methods failed for %s - kernel driver extension needed", reg_name)
+        data = list(struct.unpack_from(f'>{count}I', rx, 8))
+        if write and data != list(values):
+            raise TC6Error(f"TC6 write data echo mismatch at 0x{address:08x}")
+        return data
+
+    def read_burst(self, address, count):
+        """Read count consecutive registers in one transaction"""
+        return self.transaction(address, count)
+
+    def write_burst(self, address, values):
+        """Write consecutive registers starting at address in one transaction"""
+        self.transaction(address, len(values), list(values))
+
+    def read(self, address):
+        """Read one register, or None on error"""
+        try:
+            return self.read_burst(address, 1)[0]
+        except (TC6Error, OSError) as e:
+            print(f"TC6 read error: {e}")
         return None
+
+    def write(self, address, value):
+        """Write one register; returns True, or None on error"""
+        try:
+            self.write_burst(address, [value])
+            return True
+        except (TC6Error, OSError) as e:
+            print(f"TC6 write error: {e}")
+        return None
+
+    def write_many(self, values):
+        """Write an address -> value dict in its order, one burst per run of
+        consecutive addresses; returns the number of entries written"""
+        runs = plan_burst_writes(values)
+        self.transactions_saved += len(values) - len(runs)
+        done = 0
+        try:
+            for start, run in runs:
+                self.write_burst(start, run)
+                done += len(run)
+        except (TC6Error, OSError) as e:
+            print(f"TC6 write error: {e}")
+        return done
+
+    def read_many(self, addresses):
+        """Read several registers, one burst per run of consecutive addresses"""
+        addresses = set(addresses)
+        runs = plan_burst_reads(addresses)
+        saved = len(addresses) - len(runs)
+        self.transactions_saved += saved
+        debug_print("Burst plan: %d registers in %d transactions (%d saved)",
+                    len(addresses), len(runs), saved)
         
-    def write_register(self, address, value):
-        """Try multiple methods to write register"""
+        values = {}
+        for start, count in runs:
+            try:
+                burst = self.read_burst(start, count)
+            except (TC6Error, OSError) as e:
+                print(f"TC6 read error: {e}")
+                continue
+            for i, value in enumerate(burst):
+                if start + i in addresses:
+                    values[start + i] = value
+        return values or None
+
+    def close(self):
+        self.transport.close()
+
+class DeviceLock:
+    """Serialise register command/response sequences on one device
+    
+    An in-process re-entrant lock is combined with fcntl.flock() on a
+    per-device lock file, so neither other threads nor other processes
+    (a monitor next to ad-hoc CLI reads) can interleave their commands
+    with ours. Time spent waiting for the lock is recorded.
+    """
+
+    def __init__(self, key):
+        name = key.strip('/').replace('/', '_') or "lan8651"
+        lock_dir = LOCK_DIR if os.access(LOCK_DIR, os.W_OK) else "/tmp"
+        self.path = os.path.join(lock_dir, f"lan8651-{name}.lock")
+        self.thread_lock = threading.RLock()
+        self.fd = None
+        self.depth = 0
+        # Wait statistics
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _lock_file(self):
+        """Take the inter-process lock; returns True if we had to wait"""
+        if self.fd is None:
+            try:
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            except OSError as e:
+                debug_print("Cannot open lock file %s (%s), locking in-process only",
+                            self.path, e)
+                return False
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return False
+        except BlockingIOError:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+            return True
+
+    def __enter__(self):
+        start = time.monotonic()
+        contended = not self.thread_lock.acquire(blocking=False)
+        if contended:
+            self.thread_lock.acquire()
+        if self.depth == 0:
+            contended = self._lock_file() or contended
+        self.depth += 1
         
-        reg_name = get_register_name(address)
-        debug_print("Attempting to write register %s (0x%08x) = 0x%08x", reg_name, address, value)
+        if self.depth == 1:
+            waited = time.monotonic() - start
+            self.acquisitions += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            if contended:
+                self.contended += 1
+                debug_print("Waited %.3f ms for device lock %s", waited * 1000, self.path)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.depth -= 1
+        if self.depth == 0 and self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.thread_lock.release()
+
+    def stats(self):
+        """Get lock wait statistics"""
+        return {
+            'acquisitions': self.acquisitions,
+            'contended': self.contended,
+            'wait_total': self.wait_total,
+            'wait_max': self.wait_max,
+        }
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+class LAN8651DeviceInfo:
+    """Stable identity of one lan865x network device
+    
+    ifindex and driver_link (the target of the sysfs driver symlink) let
+    a cached entry be checked against the running system; debugfs_path
+    is the driver's debugfs directory for this device, if found.
+    """
+
+    def __init__(self, iface, spi_device, ifindex=None, driver_link=None, debugfs_path=None):
+        self.iface = iface
+        self.spi_device = spi_device
+        self.ifindex = ifindex
+        self.driver_link = driver_link
+        self.debugfs_path = debugfs_path
+        self.sysfs_path = f"{SYS_CLASS_NET}/{iface}/device"
+
+    def __repr__(self):
+        return f"LAN8651DeviceInfo({self.iface!r}, {self.spi_device!r})"
+
+    @property
+    def label(self):
+        return f"{self.iface} ({self.spi_device})"
+
+    @property
+    def spi_bus_cs(self):
+        """(bus, chip select) parsed from the SPI device name, or None"""
+        import re
+        match = re.fullmatch(r'spi(\d+)\.(\d+)', self.spi_device)
+        return (int(match.group(1)), int(match.group(2))) if match else None
+
+    def matches(self, name):
+        """Check whether name refers to this device (interface or SPI name)"""
+        return name in (self.iface, self.spi_device)
+
+    def to_cache(self):
+        return {'iface': self.iface, 'spi_device': self.spi_device, 'ifindex': self.ifindex,
+                'driver_link': self.driver_link, 'debugfs_path': self.debugfs_path}
+
+    def is_current(self):
+        """Check that a cached entry still describes the running system
         
-        # Similar implementation for write operations
-        # This would need to be implemented based on available kernel interfaces
-        error_print("Write operations not yet implemented for %s", reg_name)
-        return False
+        The interface must still have the same ifindex and be bound to the
+        same driver, and a cached debugfs directory must still exist.
+        """
+        try:
+            with open(f"{SYS_CLASS_NET}/{self.iface}/ifindex") as f:
+                if int(f.read()) != self.ifindex:
+                    return False
+            if os.readlink(f"{self.sysfs_path}/driver") != self.driver_link:
+                return False
+        except (OSError, ValueError):
+            return False
+        return self.debugfs_path is None or os.path.isdir(self.debugfs_path)
 
-def show_register_info(address, value):
-    """Show detailed register information"""
+def ethtool_ioctl(sock, iface, data):
+    """Issue SIOCETHTOOL on sock with data (an array('B')) as ifr_data
     
-    reg_name = get_register_name(address)
-    print(f"\nRegister {reg_name} (0x{address:08x}) = 0x{value:08x} ({value})")
-    print(f"Binary: {value:032b}")
+    The kernel writes its reply back into data in place.
+    """
+    data_addr, _ = data.buffer_info()
+    ifr = struct.pack('16sP', iface.encode()[:IFNAMSIZ - 1], data_addr)
+    fcntl.ioctl(sock.fileno(), SIOCETHTOOL, ifr.ljust(IFREQ_SIZE, b'\0'))
+
+def ethtool_drvinfo(sock, iface):
+    """Get (driver, bus_info, regdump_len) of an interface via ETHTOOL_GDRVINFO
     
-    # Show bit field interpretation if available
-    bit_desc = decode_register_bits(address, value)
-    if bit_desc:
-        print(f"{bit_desc}")
+    Raises OSError when the interface does not support it.
+    """
+    drvinfo = array.array('B', bytes(ETHTOOL_DRVINFO_SIZE))
+    struct.pack_into('=I', drvinfo, 0, ETHTOOL_GDRVINFO)
+    ethtool_ioctl(sock, iface, drvinfo)
+    driver = drvinfo[ETHTOOL_DRVINFO_DRIVER].tobytes().split(b'\0')[0].decode(errors='replace')
+    bus_info = drvinfo[ETHTOOL_DRVINFO_BUS_INFO].tobytes().split(b'\0')[0].decode(errors='replace')
+    regdump_len, = struct.unpack_from('=I', drvinfo, ETHTOOL_DRVINFO_SIZE - 4)
+    return driver, bus_info, regdump_len
+
+def parse_netlink_attributes(data, offset=0):
+    """Index the netlink attributes in data[offset:] by type"""
+    attributes = {}
+    while offset + NLA_HEADER.size <= len(data):
+        length, nla_type = NLA_HEADER.unpack_from(data, offset)
+        if length < NLA_HEADER.size:
+            break
+        attributes[nla_type & NLA_TYPE_MASK] = data[offset + NLA_HEADER.size:offset + length]
+        offset += (length + 3) & ~3
+    return attributes
+
+def parse_link_message(payload):
+    """Decode an RTM_NEWLINK/RTM_DELLINK payload into a dict
     
-    # Show register description if known
-    if reg_name in ['OA_STATUS0', 'OA_STATUS1']:
-        print("Status register - shows current device state")
-    elif reg_name in ['MAC_NCR', 'MAC_NCFGR']:
-        print("MAC control register - controls network operations")
-    elif reg_name in ['BASIC_CONTROL', 'BASIC_STATUS']:
-        print("PHY basic register - standard IEEE 802.3 functionality")
-        print(f"Name: {reg_names[address]}")
-        
-        # Decode specific registers
-        if address == 0x10000:  # ID_REV
-            chip_id = (value >> 16) & 0xFFFF
-            rev_id = value & 0xFFFF
-            print(f"Chip ID: 0x{chip_id:04x}, Revision: 0x{rev_id:04x}")
-        
-        elif address == 0x10001:  # STATUS0
-            print(f"TX_FRAME_CHECK_SEQUENCE_ERROR: {(value >> 0) & 1}")
-            print(f"TX_FRAME_ERROR: {(value >> 1) & 1}")
-            print(f"TX_BUFFER_OVERFLOW_ERROR: {(value >> 2) & 1}")
-            print(f"TX_FIFO_UNDERFLOW: {(value >> 3) & 1}")
-            print(f"RX_FIFO_OVERFLOW: {(value >> 4) & 1}")
-            print(f"RX_HEADER_ERROR: {(value >> 5) & 1}")
-        
-        elif address == 0x10003:  # CONFIG0
-            print(f"PROTECTED: {(value >> 2) & 1}")
-            print(f"TX_CUT_THROUGH: {(value >> 4) & 1}")
-            print(f"RX_CUT_THROUGH: {(value >> 5) & 1}")
+    Keys: ifindex, type (ARPHRD_*), flags, ifname, parent and parent_bus;
+    the last two are None on kernels before 5.18.
+    """
+    _, arphrd, ifindex, flags, _ = IFINFOMSG.unpack_from(payload)
+    attributes = parse_netlink_attributes(payload, IFINFOMSG.size)
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 lan8651_kernelfs.py <command> [args...]")
-        print("Commands:")
-        print("  read <address>    - Read register (address can be hex or register name)")
-        print("  write <addr> <val> - Write register") 
-        print("  list              - List known registers")
-        print("  status            - Show device status")
-        print("\nExamples:")
-        print("  python3 lan8651_kernelfs.py read 0x10000")
-        print("  python3 lan8651_kernelfs.py read OA_STATUS0")
-        print("  python3 lan8651_kernelfs.py write MAC_NCR 0x0C")
-        print("  python3 lan8651_kernelfs.py list")
-        return
+    def string(nla_type):
+        value = attributes.get(nla_type)
+        return value.split(b'\0')[0].decode(errors='replace') if value is not None else None
+
+    return {'ifindex': ifindex, 'type': arphrd, 'flags': flags,
+            'ifname': string(IFLA_IFNAME), 'parent': string(IFLA_PARENT_DEV_NAME),
+            'parent_bus': string(IFLA_PARENT_DEV_BUS_NAME)}
+
+class RtNetlink:
+    """Route netlink socket
     
-    debugfs = LAN8651Debugfs()
-    
-    if sys.argv[1] == "list":
-        print("\nKnown LAN8651 Registers:")
-        print("=" * 60)
-        
-        # Group registers by type
-        std_regs = [(name, addr) for name, addr in LAN8651_REGISTERS.items() 
-                   if addr < 0x10000]
-        mac_regs = [(name, addr) for name, addr in LAN8651_REGISTERS.items() 
-                   if 0x10000 <= addr < 0x20000]
-                   
-        if std_regs:
-            print("\nStandard/PHY Registers (MMS 0):")
-            for name, addr in sorted(std_regs, key=lambda x: x[1]):
-                print(f"  {name:<15} = 0x{addr:08X}")
-                
-        if mac_regs:
-            print("\nMAC Registers (MMS 1):")  
-            for name, addr in sorted(mac_regs, key=lambda x: x[1]):
-                print(f"  {name:<15} = 0x{addr:08X}")
-        
-    elif sys.argv[1] == "read":
-        if len(sys.argv) < 3:
-            print("Error: Address required for read command")
-            return
-        
+    Answers link dumps, and with groups (a bitmask of 1 << (RTNLGRP_* - 1))
+    also receives the kernel's multicast link events.
+    """
+
+    def __init__(self, groups=0):
+        import socket
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
         try:
-            address = parse_register_address(sys.argv[2])
-            value = debugfs.read_register(address)
-            if value is not None:
-                show_register_info(address, value)
-            else:
-                print("Failed to read register")
-        except ValueError as e:
-            print(f"Error: {e}")
-            
-    elif sys.argv[1] == "write":
-        if len(sys.argv) < 4:
-            print("Error: Address and value required for write command")
-            return
+            self.sock.bind((0, groups))
+        except OSError:
+            self.sock.close()
+            raise
+        self.seq = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def close(self):
+        """Close the socket"""
+        self.sock.close()
+
+    def request(self, msg_type, flags, payload):
+        """Send one request; returns its sequence number"""
+        self.seq += 1
+        header = NLMSG_HEADER.pack(NLMSG_HEADER.size + len(payload), msg_type,
+                                   NLM_F_REQUEST | flags, self.seq, 0)
+        self.sock.send(header + payload)
+        return self.seq
+
+    def recv_messages(self):
+        """Receive one datagram; returns its (type, flags, seq, payload) messages
         
-        try:
-            address = parse_register_address(sys.argv[2])
-            value = int(sys.argv[3], 0)  # Auto-detect hex/decimal
-            
-            if debugfs.write_register(address, value):
-                reg_name = get_register_name(address)
-                print(f"Successfully wrote {reg_name} (0x{address:08X}) = 0x{value:08X}")
-            else:
-                print("Failed to write register")
+        An NLMSG_ERROR carrying an error code is raised as OSError.
+        """
+        data = self.sock.recv(NETLINK_RECV_SIZE)
+        messages = []
+        offset = 0
+        while offset + NLMSG_HEADER.size <= len(data):
+            length, msg_type, flags, seq, _ = NLMSG_HEADER.unpack_from(data, offset)
+            if length < NLMSG_HEADER.size:
+                break
+            payload = data[offset + NLMSG_HEADER.size:offset + length]
+            if msg_type == NLMSG_ERROR:
+                error, = struct.unpack_from('=i', payload)
+                if error:
+                    raise OSError(-error, os.strerror(-error))
+            messages.append((msg_type, flags, seq, payload))
+            offset += (length + 3) & ~3
+        return messages
+
+    def dump_links(self):
+        """List every network interface with one RTM_GETLINK dump
+        
+        Returns parse_link_message() dicts.
+        """
+        import socket
+        seq = self.request(RTM_GETLINK, NLM_F_DUMP, IFINFOMSG.pack(socket.AF_UNSPEC, 0, 0, 0, 0))
+        links = []
+        while True:
+            for msg_type, _, msg_seq, payload in self.recv_messages():
+                if msg_seq != seq:
+                    continue
+                if msg_type == NLMSG_DONE:
+                    return links
+                if msg_type == RTM_NEWLINK:
+                    links.append(parse_link_message(payload))
+
+class LinkWatcher:
+    """Background thread forwarding rtnetlink link events (RTNLGRP_LINK)
+    
+    Every watched object gets link_event(msg_type, link) for each
+    RTM_NEWLINK/RTM_DELLINK, with link as from parse_link_message(); when
+    the kernel dropped events (receive buffer overrun) it is called with
+    (None, None). Objects are held weakly.
+    """
+
+    def __init__(self):
+        import weakref
+        self.rtnl = RtNetlink(groups=1 << (RTNLGRP_LINK - 1))
+        self.watched = weakref.WeakSet()
+        self.watched_lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, name="lan8651-links", daemon=True)
+        self.thread.start()
+
+    def watch(self, obj):
+        """Start delivering link events to obj"""
+        with self.watched_lock:
+            self.watched.add(obj)
+
+    def unwatch(self, obj):
+        """Stop delivering link events to obj"""
+        with self.watched_lock:
+            self.watched.discard(obj)
+
+    def notify(self, msg_type, link):
+        with self.watched_lock:
+            watched = list(self.watched)
+        for obj in watched:
+            obj.link_event(msg_type, link)
+
+    def run(self):
+        while True:
+            try:
+                messages = self.rtnl.recv_messages()
+            except OSError as e:
+                if e.errno == errno.ENOBUFS:
+                    debug_print("Link events lost")
+                    self.notify(None, None)
+                    continue
+                error_print("Link watcher stopped: %s", e)
+                return
+            for msg_type, _, _, payload in messages:
+                if msg_type in (RTM_NEWLINK, RTM_DELLINK):
+                    link = parse_link_message(payload)
+                    debug_print("Link event %s: %s",
+                                "RTM_NEWLINK" if msg_type == RTM_NEWLINK else "RTM_DELLINK", link)
+                    self.notify(msg_type, link)
+
+# Process-wide LinkWatcher, started by get_link_watcher()
+link_watcher = None
+link_watcher_lock = threading.Lock()
+
+def get_link_watcher():
+    """Get the process-wide LinkWatcher, starting it on first use; None if
+    rtnetlink is unavailable"""
+    global link_watcher
+    with link_watcher_lock:
+        if link_watcher is None:
+            try:
+                link_watcher = LinkWatcher()
+            except OSError as e:
+                debug_print("Cannot watch link events: %s", e)
+                return None
+        return link_watcher
+
+def find_lan865x_devices():
+    """Find every network interface driven by lan865x, ordered by SPI device"""
+    
+    if DISCOVERY_MODE == 'netlink' and not SYSFS_ROOT:
+        try:
+            return find_lan865x_devices_netlink()
+        except OSError as e:
+            debug_print("rtnetlink discovery failed (%s), scanning sysfs", e)
+    return find_lan865x_devices_sysfs()
+
+def find_lan865x_devices_netlink():
+    """Find lan865x interfaces from one RTM_GETLINK dump
+    
+    Kernels since 5.18 report each link's parent device and bus, so only
+    interfaces on the SPI bus are asked for their driver; older kernels
+    ask every Ethernet interface. The driver name comes from the
+    ETHTOOL_GDRVINFO ioctl, since the ethtool netlink family has no
+    driver info request.
+    """
+    
+    with RtNetlink() as rtnl:
+        links = rtnl.dump_links()
+    debug_print("RTM_GETLINK dump returned %d links", len(links))
+    # Any link with a parent bus means the kernel reports them, and then a
+    # link without one (loopback, virtual devices) cannot be a lan865x
+    parents_known = any(link['parent_bus'] for link in links)
+    
+    import socket
+    devices = []
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for link in links:
+            iface_name = link['ifname']
+            if link['type'] != ARPHRD_ETHER or not iface_name:
+                continue
+            if parents_known and link['parent_bus'] != "spi":
+                debug_print("%s is on bus %s, skipping", iface_name, link['parent_bus'])
+                continue
+            try:
+                driver, bus_info, _ = ethtool_drvinfo(sock, iface_name)
+                if driver != "lan865x":
+                    debug_print("Driver '%s' of %s is not lan865x, skipping", driver, iface_name)
+                    continue
+                # Recorded so cached results can be checked like sysfs ones
+                driver_link = os.readlink(f"{SYS_CLASS_NET}/{iface_name}/device/driver")
+            except OSError as e:
+                debug_print("Cannot get driver of %s: %s", iface_name, e)
+                continue
+            spi_device = link['parent'] or bus_info
+            debug_print("Found LAN865x driver! Interface: %s (ifindex %d), SPI device: %s",
+                        iface_name, link['ifindex'], spi_device)
+            devices.append(LAN8651DeviceInfo(iface_name, spi_device, link['ifindex'], driver_link))
+    
+    if not devices:
+        debug_print("No LAN865x interfaces found via rtnetlink")
+    return sorted(devices, key=lambda d: (d.spi_device, d.iface))
+
+def find_lan865x_devices_sysfs():
+    """Find lan865x interfaces by reading the driver symlink of every interface"""
+    
+    # Look for network interfaces using lan865x driver
+    import glob
+    net_device_pattern = f"{SYS_CLASS_NET}/*/device/driver"
+    debug_print("Searching for network devices with pattern: %s", net_device_pattern)
+    net_devices = glob.glob(net_device_pattern)
+    debug_print("Found %d network device entries", len(net_devices))
+    
+    devices = []
+    for i, device_path in enumerate(net_devices):
+        debug_print("[%d/%d] Processing device: %s", i+1, len(net_devices), device_path)
+        try:
+            # Read the driver name
+            debug_print("Reading driver link for: %s", device_path)
+            driver_link = os.readlink(device_path)
+            debug_print("Driver link target: %s", driver_link)
+            
+            if "lan865x" in driver_link:
+                # Found a LAN8651 interface
+                iface_name = device_path.split('/')[-3]
+                spi_device = os.path.basename(
+                    os.path.realpath(os.path.dirname(device_path)))
+                with open(f"{SYS_CLASS_NET}/{iface_name}/ifindex") as f:
+                    ifindex = int(f.read())
+                debug_print("Found LAN865x driver! Interface: %s (ifindex %d), SPI device: %s",
+                            iface_name, ifindex, spi_device)
+                devices.append(LAN8651DeviceInfo(iface_name, spi_device, ifindex, driver_link))
+            else:
+                debug_print("Driver '%s' is not lan865x, skipping", driver_link)
+        except (OSError, ValueError) as e:
+            debug_print("Error reading %s: %s", device_path, e)
+            continue
+    
+    if not devices:
+        debug_print("No LAN865x interfaces found in sysfs")
+    return sorted(devices, key=lambda d: (d.spi_device, d.iface))
+
+def find_debugfs_path(spi_device=None, shared=True):
+    """Find the debugfs directory of the (patched) lan865x driver
+    
+    With several devices the patched driver creates one subdirectory per
+    SPI device; that one is returned when it exists. Otherwise the shared
+    directory (older patch layout) is only returned with shared=True, as
+    with several devices it would belong to just one of them.
+    """
+    
+    debug_print("Searching for debugfs entries")
+    if not os.path.exists(DEBUGFS_ROOT):
+        debug_print("Debugfs is not mounted at %s", DEBUGFS_ROOT)
+        error_print("Debugfs not available - kernel may need CONFIG_DEBUG_FS=y")
+        return None
+    
+    debug_print("Debugfs is mounted at %s", DEBUGFS_ROOT)
+    # Check for TC6 or lan865x specific debug entries
+    debug_paths = [
+        f"{DEBUGFS_ROOT}/tc6",
+        f"{DEBUGFS_ROOT}/lan865x",
+        f"{DEBUGFS_ROOT}/spi"
+    ]
+    
+    debug_print("Checking %d potential debug paths", len(debug_paths))
+    for i, path in enumerate(debug_paths):
+        debug_print("[%d/%d] Checking debugfs path: %s", i+1, len(debug_paths), path)
+        if os.path.exists(path):
+            debug_print("Found debugfs entry: %s", path)
+            if spi_device and os.path.isdir(f"{path}/{spi_device}"):
+                path = f"{path}/{spi_device}"
+            elif spi_device and not shared:
+                debug_print("No debugfs directory for %s in %s, not using the shared one",
+                            spi_device, path)
+                return None
+            info_print("Found debugfs interface: %s", path)
+            
+            # List contents for debugging
+            try:
+                contents = os.listdir(path)
+                debug_print("Debugfs contents: %s", contents)
+            except PermissionError as e:
+                debug_print("Permission denied listing %s: %s", path, e)
+            return path
+        else:
+            debug_print("Debugfs path does not exist: %s", path)
+    return None
+
+def read_boot_id():
+    """Get the id of the running boot, or None"""
+    try:
+        with open(BOOT_ID_PATH) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def read_bound_devices():
+    """Get the sorted names of the SPI devices bound to lan865x ([] if none)"""
+    try:
+        return sorted(name for name in os.listdir(LAN865X_DRIVER_DIR)
+                      if name.startswith("spi"))
+    except OSError:
+        return []
+
+def load_discovery_cache():
+    """Get the cached device list if it is from this boot and still valid, else None"""
+    
+    if not DISCOVERY_CACHE:
+        return None
+    import json
+    try:
+        with open(DISCOVERY_CACHE) as f:
+            # Only trust caches written by us or root
+            if os.fstat(f.fileno()).st_uid not in (0, os.getuid()):
+                debug_print("Ignoring discovery cache %s owned by another user", DISCOVERY_CACHE)
+                return None
+            cache = json.load(f)
+        if cache['boot_id'] != read_boot_id():
+            debug_print("Discovery cache is from another boot")
+            return None
+        if cache['bound'] != read_bound_devices():
+            debug_print("lan865x bound devices changed since the discovery cache was written")
+            return None
+        devices = [LAN8651DeviceInfo(**entry) for entry in cache['devices']]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        debug_print("Unusable discovery cache %s: %s", DISCOVERY_CACHE, e)
+        return None
+    
+    for info in devices:
+        if not info.is_current():
+            debug_print("Discovery cache entry %s is stale", info)
+            return None
+    debug_print("Using cached discovery results: %s", devices)
+    return devices
+
+def save_discovery_cache(devices):
+    """Store discovery results for later runs during this boot"""
+    
+    boot_id = read_boot_id()
+    if not DISCOVERY_CACHE or not boot_id:
+        return
+    import json
+    cache = {'boot_id': boot_id, 'bound': read_bound_devices(),
+             'devices': [info.to_cache() for info in devices]}
+    tmp_path = f"{DISCOVERY_CACHE}.{os.getpid()}"
+    try:
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_NOFOLLOW, 0o644)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, DISCOVERY_CACHE)
+        debug_print("Saved discovery results to %s", DISCOVERY_CACHE)
+    except OSError as e:
+        debug_print("Cannot write discovery cache %s: %s", DISCOVERY_CACHE, e)
+
+def discover_lan865x_devices(use_cache=True):
+    """Find every lan865x device and its debugfs directory
+    
+    Results are reused from the boot-scoped discovery cache while they
+    still match the system, so only the full scan's cost is avoided; a
+    device that appeared since the cache was written is found by calling
+    again with use_cache=False.
+    """
+    
+    if use_cache:
+        devices = load_discovery_cache()
+        if devices:
+            return devices
+    
+    devices = find_lan865x_devices()
+    for info in devices:
+        info.debugfs_path = find_debugfs_path(info.spi_device, shared=len(devices) == 1)
+    if devices:
+        save_discovery_cache(devices)
+    return devices
+
+class LAN8651Debugfs:
+    def __init__(self, device=None, snapshot_max_age=ETHTOOL_SNAPSHOT_MAX_AGE,
+                 spidev=None, shadow=True, watch=False):
+        debug_print("Initializing LAN8651Debugfs class")
+        # Device paths, found by find_interfaces() on first use (or set
+        # explicitly), and the device lock, which is keyed by them
+        self._debugfs_path = None
+        self._sysfs_path = None
+        self.discovered = False
+        self._lock = None
+        self.init_lock = threading.RLock()
+        # Which device to use: a LAN8651DeviceInfo, an interface or SPI
+        # device name, or None for the first one found
+        if isinstance(device, LAN8651DeviceInfo):
+            self.device_info, self.device_name = device, device.iface
+        else:
+            self.device_info, self.device_name = None, device
+        # Direct TC6 access through spidev, for use without the lan865x
+        # driver; $LAN8651_SPIDEV when not given
+        self.spidev = spidev if spidev is not None else os.environ.get('LAN8651_SPIDEV')
+        self.tc6 = None
+        # Last parsed ethtool dump: (iface, monotonic timestamp, index)
+        self.snapshot_max_age = snapshot_max_age
+        self.ethtool_snapshot = None
+        # Write-through shadow of the configuration registers
+        # (LAN8651_SHADOW_REGISTERS): address -> last value read or written.
+        # It assumes nobody else writes them; pass shadow=False if the
+        # driver or another tool changes them behind our back.
+        self.shadow_enabled = shadow
+        self.shadow = {}
+        self.shadow_hits = 0
+        self.shadow_misses = 0
+        self.shadow_bypassed = 0
+        # Backend selection state: the method that last worked for this
+        # device, and the methods that failed (name -> monotonic time of
+        # the failure), which are skipped for BACKEND_RETRY_INTERVAL
+        self.active_backend = None
+        self.failed_backends = {}
+        # Same for writes, which only some methods support
+        self.active_writer = None
+        self.failed_writers = {}
+        # Persistent debugfs file descriptors, keyed by file name
+        self.debugfs_fds = {}
+        # Non-blocking /dev/kmsg reader used to pick up reg_access results,
+        # and the sequence number of the last record consumed
+        self.kmsg_fd = None
+        self.kmsg_seq = -1
+        # Whether reg_access answers "read <addr> <count>" through read();
+        # None until the first attempt
+        self.reg_access_range = None
+        # Whether reg_access supports "rmw <addr> <mask> <value>"; None
+        # until the first attempt
+        self.reg_access_rmw = None
+        # Whether reg_access accepts "batch <n>" multi-command writes
+        self.reg_access_batch = None
+        # Writes buffered by an open transaction(), the thread that owns
+        # it and its nesting depth
+        self.pending_writes = None
+        self.pending_owner = None
+        self.pending_depth = 0
+        # Datagram socket reused for SIOCETHTOOL, and the per-interface
+        # ETHTOOL_GDRVINFO result: (driver name, register dump length)
+        self.ioctl_sock = None
+        self.drvinfo = {}
+        # With watch=True the link watcher sets stale_reason when the
+        # interface is removed, renamed or re-created (driver reload, SPI
+        # rebind), and the next access re-resolves the device
+        self.watch = watch
+        self.stale_reason = None
+        debug_print("Initialization complete, device discovery deferred to first access")
+    
+    def discover(self):
+        """Run interface detection, once, before the first device access"""
+        with self.init_lock:
+            if not self.discovered:
+                debug_print("Starting interface detection")
+                self.find_interfaces()
+                self.discovered = True
+                debug_print("Interface detection complete: debugfs_path=%s, sysfs_path=%s",
+                            self._debugfs_path, self._sysfs_path)
+    
+    @property
+    def debugfs_path(self):
+        self.discover()
+        return self._debugfs_path
+    
+    @debugfs_path.setter
+    def debugfs_path(self, path):
+        # An explicitly set path replaces discovery
+        self._debugfs_path = path
+        self.discovered = True
+    
+    @property
+    def sysfs_path(self):
+        self.discover()
+        return self._sysfs_path
+    
+    @sysfs_path.setter
+    def sysfs_path(self, path):
+        self._sysfs_path = path
+        self.discovered = True
+    
+    @property
+    def lock(self):
+        """Serialises command/response sequences across threads and processes"""
+        if self._lock is None:
+            with self.init_lock:
+                if self._lock is None:
+                    self._lock = DeviceLock(self.debugfs_path or self.sysfs_path or "")
+        return self._lock
+    
+    def find_interfaces(self):
+        """Find the LAN8651 network interface and debugfs entries of this device"""
+        
+        debug_print("Starting interface search")
+        
+        info = self.device_info
+        if info is None:
+            devices = discover_lan865x_devices()
+            if self.device_name:
+                matching = [d for d in devices if d.matches(self.device_name)]
+                if not matching:
+                    # Not in the cache; it may have appeared since
+                    devices = discover_lan865x_devices(use_cache=False)
+                    matching = [d for d in devices if d.matches(self.device_name)]
+                    if not matching:
+                        error_print("LAN8651 device %s not found", self.device_name)
+                devices = matching
+            if devices:
+                info = devices[0]
+        
+        if info:
+            self.device_info = info
+            self._sysfs_path = info.sysfs_path
+            info_print("Found LAN8651 interface: %s", info.iface)
+            debug_print("Set sysfs_path to: %s", self._sysfs_path)
+            if self.watch:
+                watcher = get_link_watcher()
+                if watcher:
+                    watcher.watch(self)
+        
+        # Look for debugfs entries
+        if info and info.debugfs_path:
+            self._debugfs_path = info.debugfs_path
+            debug_print("Using debugfs interface: %s", self._debugfs_path)
+        else:
+            self._debugfs_path = find_debugfs_path(info.spi_device if info else None,
+                                                   shared=len(read_bound_devices()) <= 1)
+    
+    def mark_stale(self, reason):
+        """Flag the resolved device as gone, so the next access re-resolves it"""
+        if self.stale_reason is None:
+            info_print("LAN8651 device is stale (%s)", reason)
+        self.stale_reason = reason
+    
+    def link_event(self, msg_type, link):
+        """Check a link event (from LinkWatcher) against the resolved interface"""
+        info = self.device_info
+        if info is None or self.stale_reason:
+            return
+        if msg_type is None:
+            self.mark_stale("link events lost")
+        elif link['ifindex'] == info.ifindex:
+            if msg_type == RTM_DELLINK:
+                self.mark_stale(f"{info.iface} removed")
+            elif link['ifname'] != info.iface:
+                self.mark_stale(f"{info.iface} renamed to {link['ifname']}")
+            else:
+                # Up/down, address or flag change: the driver reprograms
+                # the MAC, so nothing shadowed is trusted any more
+                self.invalidate_shadow(f"{info.iface} link change")
+        elif msg_type == RTM_NEWLINK and (link['ifname'] == info.iface or
+                                          link['parent'] == info.spi_device):
+            self.mark_stale(f"{link['ifname']} re-created")
+    
+    def check_binding(self):
+        """Re-resolve the device if it was marked stale
+        
+        Everything tied to the old driver binding is dropped first: debugfs
+        descriptors, backend selection and reg_access capabilities, the
+        ethtool snapshot, driver info and the shadow cache. The device is
+        then looked up again by SPI device, since the interface name may
+        change. Returns False while it has not come back.
+        """
+        if not self.stale_reason:
+            return True
+        with self.init_lock:
+            if not self.stale_reason:
+                return True
+            debug_print("Re-resolving device (%s)", self.stale_reason)
+            for name in list(self.debugfs_fds):
+                self.close_debugfs_file(name)
+            self.reset_backends()
+            self.invalidate_shadow("device re-resolved")
+            self.reg_access_range = None
+            self.reg_access_rmw = None
+            self.reg_access_batch = None
+            self.ethtool_snapshot = None
+            self.drvinfo.clear()
+            if self.device_info:
+                self.device_name = self.device_info.spi_device
+                self.device_info = None
+            self.stale_reason = None
+            self.discovered = False
+            self.discover()
+            if self.device_info is None:
+                self.stale_reason = "device not present"
+                return False
+            info_print("LAN8651 device %s is back as %s", self.device_name, self.device_info.iface)
+        return True
+    
+    def close(self):
+        """Close all file descriptors held open for this device"""
+        for name in list(self.debugfs_fds):
+            self.close_debugfs_file(name)
+        if self.kmsg_fd is not None:
+            os.close(self.kmsg_fd)
+            self.kmsg_fd = None
+        if self.ioctl_sock:
+            self.ioctl_sock.close()
+            self.ioctl_sock = None
+        if self.tc6:
+            self.tc6.close()
+            self.tc6 = None
+        if self._lock:
+            self._lock.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def open_debugfs_file(self, name, flags=os.O_RDWR):
+        """Get a persistent descriptor for a debugfs file"""
+        fd = self.debugfs_fds.get(name)
+        if fd is None:
+            path = f"{self.debugfs_path}/{name}"
+            fd = os.open(path, flags)
+            debug_print("Opened %s (fd=%d)", path, fd)
+            self.debugfs_fds[name] = fd
+        return fd
+    
+    def close_debugfs_file(self, name):
+        """Close the persistent descriptor for a debugfs file, if open"""
+        fd = self.debugfs_fds.pop(name, None)
+        if fd is not None:
+            debug_print("Closing %s/%s (fd=%d)", self.debugfs_path, name, fd)
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+    
+    def debugfs_io(self, name, flags, operation):
+        """Run operation(fd) on the persistent descriptor of a debugfs file
+        
+        The descriptor stays open between calls. If the file went away
+        underneath us (driver reload), it is reopened once and retried.
+        """
+        for attempt in range(2):
+            try:
+                return operation(self.open_debugfs_file(name, flags))
+            except OSError as e:
+                self.close_debugfs_file(name)
+                if attempt or e.errno not in DEBUGFS_REOPEN_ERRNOS:
+                    raise
+                debug_print("Debugfs file %s went away (%s), reopening", name, e)
+                # A new driver instance means the device may have been reset
+                self.invalidate_shadow("driver rebound")
+    
+    def debugfs_transfer(self, name, command, size=64):
+        """Write a command to a debugfs file at offset 0 and read back the reply
+        
+        With size=0 only the command is written and None is returned.
+        """
+        def transfer(fd):
+            os.pwrite(fd, command.encode(), 0)
+            if not size:
+                return None
+            return os.pread(fd, size, 0).decode()
+        
+        with self.lock:
+            return self.debugfs_io(name, os.O_RDWR, transfer)
+    
+    def debugfs_read(self, name, size):
+        """Read a read-only debugfs file with one pread at offset 0"""
+        return self.debugfs_io(name, os.O_RDONLY,
+                               lambda fd: os.pread(fd, size, 0).decode())
+    
+    def read_debugfs_map(self):
+        """Read the whole register map from the debugfs 'registers' file
+        
+        The patched driver publishes every readable register as one
+        '0x<addr>: 0x<value>' line, so a full snapshot is a single read().
+        """
+        
+        if not self.debugfs_path:
+            return None
+        
+        try:
+            text = self.debugfs_read('registers', DEBUGFS_REGISTERS_SIZE)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Debugfs read error: {e}")
+            return None
+        
+        return parse_register_lines(text) or None
+    
+    def read_via_debugfs(self, address):
+        """Try to read register via the debugfs register map"""
+        
+        index = self.read_debugfs_map()
+        if index:
+            return index.get(address, NOT_AVAILABLE)
+        return None
+    
+    def read_many_via_debugfs(self, addresses):
+        """Read several registers from one read of the debugfs register map"""
+        
+        index = self.read_debugfs_map()
+        if not index:
+            return None
+        return {address: index[address] for address in addresses
+                if address in index} or NOT_AVAILABLE
+    
+    def open_kmsg(self):
+        """Open /dev/kmsg non-blocking, positioned after the existing records"""
+        if self.kmsg_fd is None:
+            self.kmsg_fd = os.open(KMSG_PATH, os.O_RDONLY | os.O_NONBLOCK)
+            os.lseek(self.kmsg_fd, 0, os.SEEK_END)
+            debug_print("Opened %s (fd=%d)", KMSG_PATH, self.kmsg_fd)
+        return self.kmsg_fd
+    
+    def read_kmsg_records(self):
+        """Yield (seq, message) for every kernel log record after the cursor"""
+        fd = self.open_kmsg()
+        while True:
+            try:
+                record = os.read(fd, 8192)
+            except BlockingIOError:
+                return
+            except BrokenPipeError:
+                # Records were overwritten before we read them; the next
+                # read continues at the oldest record still available
+                debug_print("Kernel log records lost, resyncing")
+                continue
+            
+            header, _, message = record.decode(errors='replace').partition(';')
+            fields = header.split(',')
+            if len(fields) < 2 or not fields[1].isdigit():
+                continue
+            seq = int(fields[1])
+            if seq <= self.kmsg_seq:
+                continue
+            self.kmsg_seq = seq
+            yield seq, message.split('\n', 1)[0]
+    
+    def read_range_via_reg_access(self, address, count):
+        """Read count consecutive registers with one 'read <addr> <count>'
+        
+        The patched driver answers with 'addr: value' lines returned by
+        read() on the same file, so a range costs one pwrite/pread pair.
+        Returns a dict, or None if reg_access does not support ranges.
+        
+        The first call finds out whether ranges are supported. An older
+        patch takes the probe for a plain 'read <addr>' and really reads
+        the register, so its kernel log record is used for the value
+        instead of reading (and for clear-on-read registers, losing) it
+        a second time.
+        """
+        
+        if not self.debugfs_path or self.reg_access_range is False:
+            return None
+        
+        with self.lock:
+            start_seq = None
+            if self.reg_access_range is None:
+                try:
+                    start_seq = self.skip_kmsg_records()
+                except OSError as e:
+                    debug_print("Kernel log not available: %s", e)
+            
+            try:
+                reply = self.debugfs_transfer('reg_access', f"read 0x{address:08x} {count}",
+                                              size=REG_ACCESS_RESULT_SIZE)
+            except FileNotFoundError:
+                return None
+            except OSError as e:
+                print(f"reg_access range read error: {e}")
+                return None
+            
+            values = parse_register_lines(reply)
+            if self.reg_access_range is None:
+                self.reg_access_range = bool(values)
+                debug_print("reg_access range reads %s",
+                            "supported" if values else "not supported, using kernel log")
+                if not values and start_seq is not None:
+                    value = self.wait_kmsg_reg_read(address, start_seq)
+                    return {address: value} if value is not None else None
+        return {a: v for a, v in values.items() if address <= a < address + count} or None
+    
+    def read_many_via_reg_access(self, addresses):
+        """Read several registers with one range command per consecutive run"""
+        
+        values = {}
+        for start, count in plan_burst_reads(addresses, REG_ACCESS_MAX_COUNT):
+            run = self.read_range_via_reg_access(start, count) or {}
+            values.update(run)
+            if self.reg_access_range is False:
+                # Older patch: one command and kernel log record per
+                # register, except those the range probe already read
+                for address in range(start, start + count):
+                    if address in run:
+                        continue
+                    value = self.read_via_reg_access_kmsg(address)
+                    if value is not None:
+                        values[address] = value
+        
+        wanted = set(addresses)
+        return {a: v for a, v in values.items() if a in wanted} or None
+    
+    def read_via_reg_access(self, address):
+        """Try to read via the patched driver's debugfs reg_access file"""
+        
+        values = self.read_range_via_reg_access(address, 1)
+        if values:
+            return values.get(address)
+        if self.reg_access_range is False:
+            return self.read_via_reg_access_kmsg(address)
+        return None
+    
+    def read_via_reg_access_kmsg(self, address):
+        """Read one register via reg_access, taking the result from /dev/kmsg
+        
+        Older versions of the patch report the value only as a
+        'REG READ 0x... = 0x...' kernel log line. Records already in the
+        log are skipped first, so only a line logged after our command,
+        for our address, is accepted.
+        """
+        
+        if not self.debugfs_path:
+            return None
+        
+        with self.lock:
+            try:
+                start_seq = self.skip_kmsg_records()
+                self.debugfs_transfer('reg_access', f"read 0x{address:08x}", size=0)
+            except FileNotFoundError:
+                return None
+            except OSError as e:
+                print(f"reg_access read error: {e}")
+                return None
+            
+            return self.wait_kmsg_reg_read(address, start_seq)
+    
+    def skip_kmsg_records(self):
+        """Move the kernel log cursor past every record already logged
+        
+        Returns the sequence number reached, to be passed on to
+        wait_kmsg_reg_read() after issuing a read command.
+        """
+        for _ in self.read_kmsg_records():
+            pass
+        return self.kmsg_seq
+    
+    def wait_kmsg_reg_read(self, address, start_seq):
+        """Wait for the 'REG READ' kernel log record of address after start_seq
+        
+        Returns the value it reports, or None after KMSG_REPLY_TIMEOUT.
+        """
+        
+        import re
+        import select
+        poller = select.poll()
+        poller.register(self.kmsg_fd, select.POLLIN)
+        deadline = time.monotonic() + KMSG_REPLY_TIMEOUT
+        while True:
+            for seq, message in self.read_kmsg_records():
+                match = re.search(KMSG_REG_READ, message)
+                if match and int(match.group(1), 16) == address:
+                    debug_print("Matched kernel log record %d (after %d): %s",
+                                seq, start_seq, message)
+                    return int(match.group(2), 16)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.stale_reason or not poller.poll(remaining * 1000):
+                break
+        
+        debug_print("No REG READ record for 0x%08x in kernel log", address)
+        return None
+    
+    def write_via_reg_access(self, address, value):
+        """Try to write via the patched driver's debugfs reg_access file"""
+        
+        if not self.debugfs_path:
+            return None
+        
+        try:
+            self.debugfs_transfer('reg_access', f"write 0x{address:08x} 0x{value:08x}", size=0)
+            return True
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"reg_access write error: {e}")
+            return None
+    
+    def write_many_via_reg_access(self, values):
+        """Write several registers with one 'batch <n>' write per chunk
+        
+        The patched driver runs all commands of a batch from a single
+        write(), stops at the first one that fails and reports how many
+        it ran as 'batch <done> <n>' through read(). Older patches reject
+        batches with EINVAL; then one write command per register is used.
+        Returns the number of leading entries written.
+        """
+        
+        if not self.debugfs_path:
+            return None
+        
+        items = list(values.items())
+        done = 0
+        for i in range(0, len(items), REG_ACCESS_MAX_COUNT):
+            chunk = items[i:i + REG_ACCESS_MAX_COUNT]
+            if self.reg_access_batch is not False:
+                command = f"batch {len(chunk)}\n" + ''.join(
+                    f"write 0x{address:08x} 0x{value:08x}\n" for address, value in chunk)
+                try:
+                    self.debugfs_transfer('reg_access', command, size=0)
+                    self.reg_access_batch = True
+                    done += len(chunk)
+                    continue
+                except FileNotFoundError:
+                    return done
+                except OSError as e:
+                    if e.errno != errno.EINVAL or self.reg_access_batch:
+                        print(f"reg_access batch write error: {e}")
+                        return done + self.read_batch_progress(len(chunk))
+                    debug_print("reg_access batch writes not supported, writing one by one")
+                    self.reg_access_batch = False
+            
+            for address, value in chunk:
+                if not self.write_via_reg_access(address, value):
+                    return done
+                done += 1
+        return done
+    
+    def read_batch_progress(self, count):
+        """Get how many commands of a failed reg_access batch of count ran
+        
+        Taken from the 'batch <done> <n>' reply; 0 if there is none.
+        """
+        try:
+            reply = self.debugfs_io('reg_access', os.O_RDWR,
+                                    lambda fd: os.pread(fd, 64, 0).decode())
+        except OSError:
+            return 0
+        fields = reply.split()
+        if len(fields) == 3 and fields[0] == "batch" and fields[2] == str(count):
+            try:
+                return min(int(fields[1]), count)
+            except ValueError:
+                pass
+        return 0
+    
+    def rmw_via_reg_access(self, address, mask, value):
+        """Read-modify-write one register with a single 'rmw' command
+        
+        Returns the new register value, or None if reg_access is missing
+        or does not know the command (older patches ignore it).
+        """
+        
+        if not self.debugfs_path or self.reg_access_rmw is False:
+            return None
+        
+        try:
+            reply = self.debugfs_transfer('reg_access',
+                                          f"rmw 0x{address:08x} 0x{mask:08x} 0x{value:08x}")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            print(f"reg_access rmw error: {e}")
+            return None
+        
+        import re
+        match = re.search(REG_ACCESS_RMW_REPLY, reply)
+        if match and int(match.group(1), 16) != address:
+            match = None
+        if self.reg_access_rmw is None:
+            self.reg_access_rmw = bool(match)
+            debug_print("reg_access rmw %s", "supported" if match else "not supported")
+        if not match:
+            return None
+        
+        debug_print("rmw 0x%08x: 0x%s -> 0x%s", address, match.group(2), match.group(3))
+        return int(match.group(3), 16)
+    
+    def read_via_spi_debug(self, address):
+        """Try to access SPI debug information"""
+        
+        if not self.sysfs_path:
+            return None
+        
+        # Check if there are SPI device attributes we can use
+        import glob
+        spi_attrs = glob.glob(f"{self.sysfs_path}/spi*/registers") 
+        if spi_attrs:
+            try:
+                with self.lock:
+                    with open(spi_attrs[0], 'w') as f:
+                        f.write(f"read 0x{address:08x}")
+                    
+                    with open(spi_attrs[0], 'r') as f:
+                        result = f.read().strip()
+                # Parse result - format depends on kernel implementation
+                if "=" in result:
+                    value_str = result.split("=")[1].strip()
+                    return int(value_str, 0)
+            except Exception as e:
+                print(f"SPI debug read error: {e}")
+        
+        return None
+    
+    def dump_via_ethtool(self, iface):
+        """Run one ethtool register dump and index it by address"""
+        
+        import subprocess
+        try:
+            # Use ethtool to dump registers
+            result = subprocess.run(['ethtool', '-d', iface], 
+                                  capture_output=True, text=True)
+            
+            if result.returncode == 0:
+                return parse_ethtool_dump(result.stdout)
+        except Exception as e:
+            print(f"Ethtool error: {e}")
+        
+        return None
+    
+    def get_ethtool_snapshot(self, iface, addresses):
+        """Get an ethtool dump for addresses, reusing a recent one if allowed
+        
+        The last dump is reused while it is younger than snapshot_max_age,
+        unless one of the requested registers is volatile.
+        """
+        
+        if self.ethtool_snapshot and self.snapshot_max_age > 0:
+            snap_iface, snap_time, index = self.ethtool_snapshot
+            age = time.monotonic() - snap_time
+            if (snap_iface == iface and age <= self.snapshot_max_age and
+                    not any(address in LAN8651_VOLATILE_REGISTERS for address in addresses)):
+                debug_print("Using ethtool snapshot (age %.1f ms)", age * 1000)
+                return index
+        
+        index = self.dump_via_ethtool(iface)
+        if index:
+            self.ethtool_snapshot = (iface, time.monotonic(), index)
+        return index
+    
+    def read_via_ethtool(self, iface, address):
+        """Try to read via ethtool register dump"""
+        
+        index = self.get_ethtool_snapshot(iface, [address])
+        if index:
+            return index.get(address, NOT_AVAILABLE)
+        return None
+    
+    def read_many_via_ethtool(self, iface, addresses):
+        """Read several registers from a single ethtool register dump"""
+        
+        index = self.get_ethtool_snapshot(iface, addresses)
+        if not index:
+            return None
+        return {address: index[address] for address in addresses
+                if address in index} or NOT_AVAILABLE
+    
+    def get_ioctl_sock(self):
+        """Get the datagram socket used for SIOCETHTOOL, creating it once"""
+        if self.ioctl_sock is None:
+            import socket
+            self.ioctl_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            debug_print("Created ioctl socket: fd=%d", self.ioctl_sock.fileno())
+        return self.ioctl_sock
+    
+    def ethtool_ioctl(self, iface, data):
+        """Issue SIOCETHTOOL with data (an array('B')) as ifr_data
+        
+        The kernel writes its reply back into data in place.
+        """
+        ethtool_ioctl(self.get_ioctl_sock(), iface, data)
+    
+    def get_ethtool_drvinfo(self, iface):
+        """Get (driver, regdump_len) for an interface, querying it only once"""
+        
+        if iface not in self.drvinfo:
+            try:
+                driver, _, regdump_len = ethtool_drvinfo(self.get_ioctl_sock(), iface)
+                debug_print("Driver info for %s: driver='%s', regdump_len=%d",
+                            iface, driver, regdump_len)
+                self.drvinfo[iface] = (driver, regdump_len)
+            except OSError as e:
+                debug_print("ETHTOOL_GDRVINFO ioctl failed on %s: %s", iface, e)
+                self.drvinfo[iface] = (None, 0)
+        return self.drvinfo[iface]
+    
+    def check_ethtool_driver(self, iface):
+        """Check that an interface is driven by lan865x (ETHTOOL_GDRVINFO)"""
+        driver, _ = self.get_ethtool_drvinfo(iface)
+        return driver == "lan865x"
+    
+    def read_via_ioctl(self, iface, address):
+        """Try to read via the ETHTOOL_GLANREG ioctl (one syscall per register)"""
+        
+        if not self.check_ethtool_driver(iface):
+            return None
+        
+        reg_access = array.array('B', LAN8651_REG_ACCESS.pack(ETHTOOL_GLANREG, address, 0))
+        try:
+            self.ethtool_ioctl(iface, reg_access)
+            _, _, value = LAN8651_REG_ACCESS.unpack(reg_access)
+            return value
+        except OSError as e:
+            # EOPNOTSUPP/EINVAL: driver extension not present
+            debug_print("ETHTOOL_GLANREG ioctl failed on %s: %s", iface, e)
+        
+        return None
+    
+    def write_via_ioctl(self, iface, address, value):
+        """Try to write via the ETHTOOL_SLANREG ioctl"""
+        
+        if not self.check_ethtool_driver(iface):
+            return None
+        
+        reg_access = array.array('B', LAN8651_REG_ACCESS.pack(ETHTOOL_SLANREG, address, value))
+        try:
+            self.ethtool_ioctl(iface, reg_access)
+            return True
+        except OSError as e:
+            debug_print("ETHTOOL_SLANREG ioctl failed on %s: %s", iface, e)
+        
+        return None
+    
+    def dump_via_gregs(self, iface):
+        """Fetch the whole register map with one ETHTOOL_GREGS ioctl"""
+        
+        if not self.check_ethtool_driver(iface):
+            return None
+        _, regdump_len = self.get_ethtool_drvinfo(iface)
+        if not regdump_len:
+            debug_print("Driver on %s reports no register dump", iface)
+            return None
+        
+        regs = array.array('B', bytes(ETHTOOL_REGS_HEADER.size + regdump_len))
+        ETHTOOL_REGS_HEADER.pack_into(regs, 0, ETHTOOL_GREGS, 0, regdump_len)
+        try:
+            self.ethtool_ioctl(iface, regs)
+        except OSError as e:
+            debug_print("ETHTOOL_GREGS ioctl failed on %s: %s", iface, e)
+            return None
+        
+        _, version, length = ETHTOOL_REGS_HEADER.unpack_from(regs)
+        debug_print("ETHTOOL_GREGS on %s: version=%d, len=%d", iface, version, length)
+        return RegisterDump(memoryview(regs)[ETHTOOL_REGS_HEADER.size:][:min(length, regdump_len)])
+    
+    def read_via_gregs(self, iface, address):
+        """Try to read one register out of a full ETHTOOL_GREGS dump"""
+        dump = self.dump_via_gregs(iface)
+        if dump:
+            value = dump.get(address)
+            return NOT_AVAILABLE if value is None else value
+        return None
+    
+    def read_many_via_gregs(self, iface, addresses):
+        """Read several registers from a single ETHTOOL_GREGS dump"""
+        dump = self.dump_via_gregs(iface)
+        if not dump:
+            return None
+        return {address: dump.get(address) for address in addresses
+                if address in dump} or NOT_AVAILABLE
+    
+    def get_tc6(self):
+        """Get the TC6 backend on the configured spidev device, opening it once"""
+        if self.tc6 is None and self.spidev:
+            try:
+                self.tc6 = TC6Backend(SpidevTransport(self.spidev))
+            except OSError as e:
+                print(f"spidev open error: {e}")
+        return self.tc6
+    
+    def read_via_spidev(self, address):
+        """Try to read via TC6 control transactions on spidev"""
+        tc6 = self.get_tc6()
+        if tc6:
+            return tc6.read(address)
+        return None
+    
+    def read_many_via_spidev(self, addresses):
+        """Read several registers via TC6 control transactions on spidev"""
+        tc6 = self.get_tc6()
+        if tc6:
+            return tc6.read_many(addresses)
+        return None
+    
+    def write_via_spidev(self, address, value):
+        """Try to write via a TC6 control transaction on spidev"""
+        tc6 = self.get_tc6()
+        if tc6:
+            return tc6.write(address, value)
+        return None
+    
+    def write_many_via_spidev(self, values):
+        """Write several registers via TC6 burst writes on spidev"""
+        tc6 = self.get_tc6()
+        if tc6:
+            return tc6.write_many(values)
+        return None
+    
+    def get_iface(self):
+        """Get the network interface name of the detected device"""
+        if self.sysfs_path:
+            return self.sysfs_path.split('/')[-2]
+        return None
+
+    def get_backends(self):
+        """Get the ordered register access fallback chain for this device"""
+        backends = [
+            RegisterBackend('reg_access', self.read_via_reg_access,
+                            self.read_many_via_reg_access, self.write_via_reg_access,
+                            self.write_many_via_reg_access),
+            RegisterBackend('debugfs', self.read_via_debugfs,
+                            self.read_many_via_debugfs),
+        ]
+        iface = self.get_iface()
+        if iface:
+            backends.append(RegisterBackend(
+                'ioctl', lambda address: self.read_via_ioctl(iface, address),
+                write=lambda address, value: self.write_via_ioctl(iface, address, value)))
+            backends.append(RegisterBackend(
+                'ethtool GREGS',
+                lambda address: self.read_via_gregs(iface, address),
+                lambda addresses: self.read_many_via_gregs(iface, addresses)))
+        backends.append(RegisterBackend('SPI debug', self.read_via_spi_debug))
+        if iface:
+            backends.append(RegisterBackend(
+                'ethtool',
+                lambda address: self.read_via_ethtool(iface, address),
+                lambda addresses: self.read_many_via_ethtool(iface, addresses)))
+        if self.spidev:
+            backends.append(RegisterBackend(
+                'spidev', self.read_via_spidev, self.read_many_via_spidev,
+                self.write_via_spidev, self.write_many_via_spidev))
+        return backends
+
+    def reset_backends(self, reads=True, writes=True):
+        """Forget the selected backends so the next access probes again"""
+        if reads:
+            debug_print("Resetting backend selection (active=%s, failed=%s)",
+                        self.active_backend, sorted(self.failed_backends))
+            self.active_backend = None
+            self.failed_backends.clear()
+        if writes:
+            debug_print("Resetting writer selection (active=%s, failed=%s)",
+                        self.active_writer, sorted(self.failed_writers))
+            self.active_writer = None
+            self.failed_writers.clear()
+
+    def run_backends(self, attempt, writes=False):
+        """Run attempt(backend) on the cached backend or probe for a new one
+
+        Returns (backend, result), or (None, None) if no backend could do it.
+        The first backend that succeeds is remembered and used directly
+        afterwards. A backend that answers NOT_AVAILABLE stays selected and
+        the request goes to the other backends; only a failure (None) drops
+        the remembered backend. Failed backends are skipped for
+        BACKEND_RETRY_INTERVAL seconds, or until every backend has failed.
+        With writes=True only backends that can write are tried, and the
+        selection is kept separately from the one for reads.
+        The device lock is held throughout.
+        """
+        with self.lock:
+            if not self.check_binding():
+                error_print("LAN8651 device %s unavailable: %s", self.device_name, self.stale_reason)
+                return None, None
+            return self._run_backends(attempt, writes)
+    
+    def _run_backends(self, attempt, writes):
+        active = self.active_writer if writes else self.active_backend
+        failed = self.failed_writers if writes else self.failed_backends
+        
+        if active:
+            result = attempt(active)
+            if result is NOT_AVAILABLE:
+                debug_print("Active backend %s does not provide this, trying others", active.name)
+            elif result is not None:
+                return active, result
+            elif self.stale_reason:
+                debug_print("Device went away (%s), not re-probing", self.stale_reason)
+                return None, None
+            else:
+                debug_print("Active backend %s failed, re-probing", active.name)
+                failed[active.name] = time.monotonic()
+                if writes:
+                    self.active_writer = None
+                else:
+                    self.active_backend = None
+        
+        now = time.monotonic()
+        backends = [backend for backend in self.get_backends()
+                    if not (writes and backend.write is None)]
+        usable = [backend for backend in backends
+                  if now - failed.get(backend.name, -BACKEND_RETRY_INTERVAL) >= BACKEND_RETRY_INTERVAL]
+        if not usable:
+            debug_print("Every backend failed recently, probing them all again")
+            failed.clear()
+            usable = backends
+        
+        for backend in usable:
+            if active and backend.name == active.name:
+                continue
+            if self.stale_reason:
+                # An in-flight access fails at once instead of trying the rest
+                debug_print("Device went away (%s), abandoning probe", self.stale_reason)
+                return None, None
+            result = attempt(backend)
+            if result is NOT_AVAILABLE:
+                debug_print("Backend %s does not provide this", backend.name)
+                continue
+            if result is not None:
+                failed.pop(backend.name, None)
+                if (self.active_writer if writes else self.active_backend) is None:
+                    debug_print("Selected %s backend %s", "write" if writes else "read",
+                                backend.name)
+                    if writes:
+                        self.active_writer = backend
+                    else:
+                        self.active_backend = backend
+                return backend, result
+            debug_print("Backend %s failed probe", backend.name)
+            failed[backend.name] = time.monotonic()
+        
+        return None, None
+    
+    def invalidate_shadow(self, reason):
+        """Drop every value held in the shadow register cache"""
+        if self.shadow:
+            debug_print("Invalidating %d shadowed registers (%s)", len(self.shadow), reason)
+            self.shadow.clear()
+    
+    def shadow_lookup(self, address):
+        """Get a register value from the shadow cache, counting hits and misses"""
+        if not self.shadow_enabled or address not in LAN8651_SHADOW_REGISTERS:
+            self.shadow_bypassed += 1
+            return None
+        value = self.shadow.get(address)
+        if value is None:
+            self.shadow_misses += 1
+        else:
+            self.shadow_hits += 1
+        return value
+    
+    def shadow_store(self, address, value):
+        """Remember a value read from or written to the hardware"""
+        if self.shadow_enabled and address in LAN8651_SHADOW_REGISTERS:
+            self.shadow[address] = value & ~LAN8651_SELF_CLEARING_BITS.get(address, 0)
+    
+    def shadow_written(self, address, value):
+        """Update the shadow cache after a successful write"""
+        if (address == LAN8651_REGISTERS['OA_RESET'] or
+                (address == LAN8651_REGISTERS['BASIC_CONTROL'] and
+                 value & LAN8651_BASIC_CONTROL_BITS['RESET'])):
+            self.invalidate_shadow(f"{get_register_name(address)} reset")
+        else:
+            self.shadow_store(address, value)
+    
+    def shadow_stats(self):
+        """Get shadow cache statistics (hits, misses, bypassed volatile reads, entries)"""
+        return {'hits': self.shadow_hits, 'misses': self.shadow_misses,
+                'bypassed': self.shadow_bypassed, 'entries': len(self.shadow)}
+    
+    def read_register(self, address, cached=True):
+        """Read register via the first working access method
+        
+        Configuration registers are served from the shadow cache unless
+        cached=False.
+        """
+        
+        reg_name = get_register_name(address)
+        if cached:
+            value = self.shadow_lookup(address)
+            if value is not None:
+                debug_print("Shadow hit: %s = 0x%08x", reg_name, value)
+                return value
+        debug_print("Attempting to read register %s (0x%08x)", reg_name, address)
+        
+        backend, value = self.run_backends(lambda b: b.read(address))
+        if backend is not None:
+            info_print("Read via %s: %s = 0x%08x", backend.name, reg_name, value)
+            self.shadow_store(address, value)
+            return value
+        
+        error_print("All read methods failed for %s - kernel driver extension needed", reg_name)
+        return None
+    
+    def read_registers(self, addresses, cached=True):
+        """Read several registers in as few backend transactions as possible
+        
+        Returns a dict mapping every requested address to its value, or to
+        None for registers that could not be read. Configuration registers
+        are served from the shadow cache unless cached=False.
+        """
+        
+        addresses = list(dict.fromkeys(addresses))
+        shadowed = {}
+        if cached:
+            for address in addresses:
+                value = self.shadow_lookup(address)
+                if value is not None:
+                    shadowed[address] = value
+        missing = [address for address in addresses if address not in shadowed]
+        debug_print("Attempting batch read of %d registers (%d from shadow)",
+                    len(missing), len(shadowed))
+        
+        values = {}
+        backends = {}
+        if missing:
+            backend, values = self.run_backends(lambda b: b.read_batch(missing))
+            values = dict(values or {})
+            backends = dict.fromkeys(values, backend)
+            rest = [address for address in missing if address not in values]
+            if backend is not None and rest:
+                # The selected backend does not provide all of them
+                other, extra = self.run_backends(lambda b: b.read_batch(rest))
+                for address, value in (extra or {}).items():
+                    values[address] = value
+                    backends[address] = other
+        
+        results = {}
+        for address in addresses:
+            reg_name = get_register_name(address)
+            if address in shadowed:
+                results[address] = shadowed[address]
+                continue
+            value = values.get(address)
+            if value is None:
+                error_print("Read failed for %s", reg_name)
+            else:
+                info_print("Read via %s: %s = 0x%08x", backends[address].name, reg_name, value)
+                self.shadow_store(address, value)
+            results[address] = value
+        return results
+        
+    def lock_stats(self):
+        """Get device lock statistics (acquisitions, contended, wait_total/max in s)"""
+        if self._lock is None:
+            return {}
+        return self._lock.stats()
+    
+    def dump_registers(self):
+        """Read the whole register map as an address -> value dict
+        
+        Uses a single read of the debugfs register map or a single
+        ETHTOOL_GREGS dump when the driver provides one, and falls back to
+        a batch read of all known registers otherwise, leaving out those
+        with read side effects as the driver does. Always reads the
+        hardware, and refreshes the shadow cache with the result.
+        """
+        
+        with self.lock:
+            if not self.check_binding():
+                error_print("LAN8651 device %s unavailable: %s", self.device_name, self.stale_reason)
+                return {}
+            values = self.read_debugfs_map()
+            if values:
+                debug_print("Dumped %d registers via debugfs register map", len(values))
+            else:
+                iface = self.get_iface()
+                dump = self.dump_via_gregs(iface) if iface else None
+                if dump:
+                    debug_print("Dumped %d registers via ETHTOOL_GREGS", len(dump))
+                    values = dict(dump.items())
+                else:
+                    values = self.read_registers(LAN8651_DUMP_REGISTERS, cached=False)
+                    values = {address: value for address, value in values.items()
+                              if value is not None}
+            
+            for address, value in values.items():
+                self.shadow_store(address, value)
+        return values
+    
+    def write_register(self, address, value, verify=False):
+        """Write register via the first working write method
+        
+        With verify=True the register is read back through the same
+        method and the write only counts as successful if the value
+        matches. Volatile and write-1-to-clear registers are not
+        verified. Writes the register metadata rules out (read-only
+        registers, values wider than the register) are refused without
+        touching the device.
+        """
+        
+        reg_name = get_register_name(address)
+        
+        problem = check_register_write(address, value)
+        if problem:
+            error_print("Refusing write: %s", problem)
+            return False
+        
+        if self.in_transaction():
+            debug_print("Queued write %s (0x%08x) = 0x%08x", reg_name, address, value)
+            # Moved to the end, so the queue keeps the order of the last writes
+            self.pending_writes.pop(address, None)
+            self.pending_writes[address] = value
+            return True
+        
+        debug_print("Attempting to write register %s (0x%08x) = 0x%08x", reg_name, address, value)
+        
+        with self.lock:
+            backend, ok = self.run_backends(lambda b: b.write(address, value), writes=True)
+            if backend is None:
+                error_print("All write methods failed for %s - kernel driver extension needed", reg_name)
+                return False
+            info_print("Wrote via %s: %s = 0x%08x", backend.name, reg_name, value)
+            # A cached ethtool dump no longer reflects the device
+            self.ethtool_snapshot = None
+            self.shadow_written(address, value)
+            
+            if not verify:
+                return True
+            if not register_verifiable(address):
+                debug_print("Not verifying volatile register %s", reg_name)
+                return True
+            
+            readback = backend.read(address)
+            if readback is None or readback is NOT_AVAILABLE:
+                readback = self.read_register(address, cached=False)
+        
+        if not register_readback_matches(address, value, readback):
+            error_print("Verify failed for %s: wrote 0x%08x, read back %s", reg_name, value,
+                        "nothing" if readback is None else f"0x{readback:08x}")
+            self.shadow.pop(address, None)
+            return False
+        debug_print("Verified %s = 0x%08x", reg_name, readback)
+        return True
+    
+    def write_registers(self, values, verify=False):
+        """Write several registers in order; values maps address -> value
+        
+        Returns a dict mapping every address to True or False. The device
+        lock is held for the whole sequence.
+        """
+        
+        with self.lock:
+            return {address: self.write_register(address, value, verify)
+                    for address, value in values.items()}
+    
+    def in_transaction(self):
+        """Check whether the calling thread has a transaction() open"""
+        return self.pending_writes is not None and self.pending_owner == threading.get_ident()
+    
+    def transaction(self, verify=False):
+        """Buffer register writes and flush them together
+        
+        Inside 'with dev.transaction():' write_register() only queues the
+        write (the last value per address wins, at the position of that
+        last write); reads still go to the hardware. On a clean exit the
+        writes are flushed in that order by flush_writes(); if the block
+        raises they are dropped.
+        The device lock is held for the whole block.
+        """
+        return RegisterTransaction(self, verify)
+    
+    def flush_writes(self, values, verify=False):
+        """Write an address -> value dict in its order, batched
+        
+        Uses the cheapest path the active write method offers: one
+        multi-command reg_access write, TC6 burst writes, or one write
+        per register. If a method fails part-way, only the writes it did
+        not complete are passed on to the next one. Returns a dict mapping
+        every address to True or False, in the order given.
+        """
+        
+        results = dict.fromkeys(values, False)
+        pending = {}
+        for address, value in values.items():
+            problem = check_register_write(address, value)
+            if problem:
+                error_print("Refusing write: %s", problem)
+            else:
+                pending[address] = value
+        if not pending:
+            return results
+        debug_print("Flushing %d queued writes", len(pending))
+        
+        written = {}
+        with self.lock:
+            while pending:
+                backend, done = self.run_backends(lambda b: b.write_batch(pending), writes=True)
+                if backend is None:
+                    error_print("All write methods failed for %d queued registers", len(pending))
+                    break
+                info_print("Wrote %d registers via %s", done, backend.name)
+                items = list(pending.items())
+                for address, value in items[:done]:
+                    self.shadow_written(address, value)
+                    results[address] = True
+                    written.setdefault(backend, []).append(address)
+                pending = dict(items[done:])
+            if written:
+                # A cached ethtool dump no longer reflects the device
+                self.ethtool_snapshot = None
+            if not verify:
+                return results
+            
+            readback = {}
+            for backend, addresses in written.items():
+                addresses = [a for a in addresses if register_verifiable(a)]
+                if addresses:
+                    values_read = backend.read_batch(addresses)
+                    if isinstance(values_read, dict):
+                        readback.update(values_read)
+                    for address in addresses:
+                        if readback.get(address) is None:
+                            readback[address] = self.read_register(address, cached=False)
+        
+        for address, value in readback.items():
+            if not register_readback_matches(address, values[address], value):
+                error_print("Verify failed for %s: wrote 0x%08x, read back %s",
+                            get_register_name(address), values[address],
+                            "nothing" if value is None else f"0x{value:08x}")
+                self.shadow.pop(address, None)
+                results[address] = False
+        return results
+    
+    def modify_register(self, address, mask, value):
+        """Set the bits selected by mask to the corresponding bits of value
+        
+        Uses the driver's 'rmw' command when reg_access supports it and a
+        read and write under the device lock otherwise. The 'rmw' command
+        holds RTNL, so it is only atomic against the driver for
+        LAN8651_RMW_ATOMIC_REGISTERS (and for registers the driver never
+        writes). Returns the new register value, or None on failure. For
+        write-1-to-clear registers only the masked bits are written, since
+        writing back the other set bits would clear them. Inside a transaction() the new
+        value is queued, computed from the value already queued for the
+        register if there is one.
+        """
+        
+        reg_name = get_register_name(address)
+        debug_print("Modifying %s (0x%08x): mask=0x%08x value=0x%08x",
+                    reg_name, address, mask, value)
+        
+        problem = check_register_write(address, value & mask)
+        if problem:
+            error_print("Refusing write: %s", problem)
+            return None
+        info = get_register_info(address)
+        if info and info.access == REG_W1C:
+            if not self.write_register(address, value & mask):
+                return None
+            return value & mask
+        if (address in LAN8651_DRIVER_WRITTEN_REGISTERS and
+                address not in LAN8651_RMW_ATOMIC_REGISTERS):
+            debug_print("%s is written by the driver outside RTNL; "
+                        "the update is not atomic against it", reg_name)
+        
+        with self.lock:
+            old_value = None
+            if self.in_transaction():
+                # The kernel rmw would bypass the queue
+                old_value = self.pending_writes.get(address)
+            else:
+                new_value = self.rmw_via_reg_access(address, mask, value)
+                if new_value is not None:
+                    self.ethtool_snapshot = None
+                    self.shadow_written(address, new_value)
+                    info_print("Modified via reg_access rmw: %s = 0x%08x", reg_name, new_value)
+                    return new_value
+            
+            if old_value is None:
+                old_value = self.read_register(address, cached=False)
+            if old_value is None:
+                return None
+            new_value = (old_value & ~mask) | (value & mask)
+            if not self.write_register(address, new_value):
+                return None
+        return new_value
+    
+    def set_bits(self, address, bits):
+        """Set bits in a register; returns the new value or None"""
+        return self.modify_register(address, bits, bits)
+    
+    def clear_bits(self, address, bits):
+        """Clear bits in a register; returns the new value or None"""
+        return self.modify_register(address, bits, 0)
+    
+    def update_field(self, address, mask, field_value):
+        """Write field_value into the bit field selected by mask
+        
+        field_value is given unshifted, e.g. update_field(addr, 0x30, 2)
+        sets bits 5:4 to 0b10. Returns the new value or None.
+        """
+        if not mask:
+            raise ValueError("Empty field mask")
+        shift = (mask & -mask).bit_length() - 1
+        if field_value << shift & ~mask:
+            raise ValueError(f"Value 0x{field_value:x} does not fit in field mask 0x{mask:08x}")
+        return self.modify_register(address, mask, field_value << shift)
+
+class RegisterTransaction:
+    """Write queue of one LAN8651Debugfs.transaction() block
+    
+    results holds the flush_writes() result after a clean exit.
+    """
+
+    def __init__(self, device, verify=False):
+        self.device = device
+        self.verify = verify
+        self.results = None
+
+    def __enter__(self):
+        device = self.device
+        device.lock.__enter__()
+        if device.pending_depth == 0:
+            device.pending_writes = {}
+            device.pending_owner = threading.get_ident()
+        device.pending_depth += 1
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        device = self.device
+        try:
+            device.pending_depth -= 1
+            if device.pending_depth == 0:
+                values, device.pending_writes, device.pending_owner = device.pending_writes, None, None
+                if exc_type is None:
+                    self.results = device.flush_writes(values, self.verify)
+                elif values:
+                    debug_print("Transaction failed, dropping %d queued writes", len(values))
+        finally:
+            device.lock.__exit__(None, None, None)
+
+    def write_register(self, address, value):
+        """Queue a write; same as device.write_register() inside the block"""
+        return self.device.write_register(address, value)
+
+class AsyncLAN8651:
+    """asyncio front end for LAN8651Debugfs
+    
+    Blocking backend calls run on a bounded thread pool. Concurrent reads
+    of a register that is already being read wait for that access instead
+    of starting another one.
+    """
+
+    def __init__(self, device=None, max_workers=ASYNC_MAX_WORKERS):
+        from concurrent.futures import ThreadPoolExecutor
+        self.device = device if device is not None else LAN8651Debugfs(watch=True)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="lan8651")
+        # address -> future of the hardware read currently in flight
+        self.inflight = {}
+        self.coalesced_reads = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the worker pool and release the device"""
+        self.executor.shutdown(wait=True)
+        self.device.close()
+
+    def _resolve(self, futures, task):
+        """Hand the result of one batch read to every future waiting on it"""
+        for address, future in futures.items():
+            if self.inflight.get(address) is future:
+                del self.inflight[address]
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result().get(address))
+
+    async def read_registers(self, addresses):
+        """Read several registers; returns an address -> value (or None) dict"""
+        
+        import asyncio
+        loop = asyncio.get_running_loop()
+        addresses = list(dict.fromkeys(addresses))
+        
+        missing = [address for address in addresses if address not in self.inflight]
+        self.coalesced_reads += len(addresses) - len(missing)
+        if missing:
+            futures = {address: loop.create_future() for address in missing}
+            self.inflight.update(futures)
+            task = loop.run_in_executor(self.executor, self.device.read_registers, missing)
+            task.add_done_callback(lambda t: self._resolve(futures, t))
+        
+        # Shielded, so a cancelled caller does not cancel a shared read
+        waiting = [asyncio.shield(self.inflight[address]) for address in addresses]
+        return dict(zip(addresses, await asyncio.gather(*waiting)))
+
+    async def read_register(self, address):
+        """Read one register; returns the value or None"""
+        return (await self.read_registers([address]))[address]
+
+    async def write_register(self, address, value, verify=False):
+        """Write one register; returns True on success"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.device.write_register,
+                                          address, value, verify)
+
+def handle_daemon_request(registry, request):
+    """Execute one framed lan8651d request and build the reply"""
+    
+    try:
+        op, count, name_len = DAEMON_HEADER.unpack_from(request)
+        name = bytes(request[DAEMON_HEADER.size:DAEMON_HEADER.size + name_len]).decode()
+        body = memoryview(request)[DAEMON_HEADER.size + name_len:]
+        
+        if op == DAEMON_OP_LIST:
+            lines = [f"{d.iface} {d.spi_device}\n" for d in registry.devices]
+            return DAEMON_HEADER.pack(DAEMON_STATUS_OK, len(lines), 0) + ''.join(lines).encode()
+        
+        device = registry.get(name or None)
+        if op == DAEMON_OP_READ:
+            addresses = [a for a, in DAEMON_ADDRESS.iter_unpack(body)][:count]
+            values = device.read_registers(addresses)
+            entries = [DAEMON_READ_RESULT.pack(values[a] is not None, values[a] or 0)
+                       for a in addresses]
+        elif op in (DAEMON_OP_WRITE, DAEMON_OP_WRITE_VERIFY):
+            verify = op == DAEMON_OP_WRITE_VERIFY
+            entries = [DAEMON_WRITE_RESULT.pack(bool(device.write_register(a, v, verify)))
+                       for a, v in list(DAEMON_PAIR.iter_unpack(body))[:count]]
+        elif op == DAEMON_OP_DUMP:
+            entries = [DAEMON_PAIR.pack(a, v) for a, v in sorted(device.dump_registers().items())]
+        else:
+            raise ValueError(f"unknown op {op}")
+    except (struct.error, ValueError, KeyError) as e:
+        error_print("Bad lan8651d request: %s", e)
+        return DAEMON_HEADER.pack(DAEMON_STATUS_ERROR, 0, 0)
+    except OSError as e:
+        # A device that went away must not take the connection down with it
+        error_print("lan8651d request failed: %s", e)
+        return DAEMON_HEADER.pack(DAEMON_STATUS_ERROR, 0, 0)
+    
+    return DAEMON_HEADER.pack(DAEMON_STATUS_OK, len(entries), 0) + b''.join(entries)
+
+class LAN8651Client:
+    """Forwards register accesses for one device to a running lan8651d
+    
+    Offers the LAN8651Debugfs methods the CLI uses, so commands work the
+    same whether they run locally or through the daemon. If the daemon
+    goes away, the client switches to local access for its device.
+    """
+
+    def __init__(self, sock, device=None):
+        self.sock = sock
+        self.name = device
+        self.device = (device or "").encode()
+        # Local LAN8651Debugfs used once the daemon has disconnected
+        self.local = None
+
+    @classmethod
+    def connect(cls, path=DAEMON_SOCKET, device=None):
+        """Connect to lan8651d; returns None if it is not running"""
+        if not path or not os.path.exists(path):
+            return None
+        import socket
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        try:
+            sock.connect(path)
+        except OSError as e:
+            debug_print("lan8651d not reachable on %s: %s", path, e)
+            sock.close()
+            return None
+        debug_print("Connected to lan8651d on %s (device %s)", path, device or "default")
+        return cls(sock, device)
+
+    def close(self):
+        self.sock.close()
+        if self.local:
+            self.local.close()
+
+    def request(self, op, entries=b'', count=0):
+        """Send one request and return the reply entries
+        
+        Returns None if the daemon answered with an error (the access
+        failed on its side); raises ConnectionError if the daemon has
+        closed the connection.
+        """
+        self.sock.send(DAEMON_HEADER.pack(op, count, len(self.device)) + self.device + entries)
+        reply = self.sock.recv(DAEMON_MAX_MESSAGE)
+        if not reply:
+            raise ConnectionError(errno.ECONNRESET, "lan8651d closed the connection")
+        status, _, _ = DAEMON_HEADER.unpack_from(reply)
+        if status != DAEMON_STATUS_OK:
+            error_print("lan8651d could not complete the request (status %d)", status)
+            return None
+        return memoryview(reply)[DAEMON_HEADER.size:]
+
+    def list_devices(self):
+        """Get the devices the daemon serves"""
+        reply = self.request(DAEMON_OP_LIST)
+        lines = bytes(reply).decode().split() if reply is not None else []
+        return [LAN8651DeviceInfo(iface, spi) for iface, spi in zip(lines[0::2], lines[1::2])]
+
+    def call(self, method, remote, *args):
+        """Run an access through the daemon, or locally once it is gone"""
+        if self.local is None:
+            try:
+                return remote(*args)
+            except ConnectionError as e:
+                error_print("lan8651d unavailable (%s), using local access for %s",
+                            e, self.name or "the first device")
+                self.sock.close()
+                self.local = LAN8651Debugfs(self.name)
+        return getattr(self.local, method)(*args)
+
+    def read_registers(self, addresses):
+        return self.call('read_registers', self.remote_read_registers, addresses)
+
+    def remote_read_registers(self, addresses):
+        addresses = list(dict.fromkeys(addresses))
+        reply = self.request(DAEMON_OP_READ, b''.join(DAEMON_ADDRESS.pack(a) for a in addresses),
+                             len(addresses))
+        if reply is None:
+            return dict.fromkeys(addresses)
+        return {address: value if valid else None
+                for address, (valid, value) in zip(addresses, DAEMON_READ_RESULT.iter_unpack(reply))}
+
+    def read_register(self, address):
+        return self.read_registers([address])[address]
+
+    def write_register(self, address, value, verify=False):
+        return self.call('write_register', self.remote_write_register, address, value, verify)
+
+    def remote_write_register(self, address, value, verify=False):
+        problem = check_register_write(address, value)
+        if problem:
+            error_print("Refusing write: %s", problem)
+            return False
+        op = DAEMON_OP_WRITE_VERIFY if verify else DAEMON_OP_WRITE
+        reply = self.request(op, DAEMON_PAIR.pack(address, value), 1)
+        return reply is not None and DAEMON_WRITE_RESULT.unpack(reply)[0]
+
+    def write_registers(self, values, verify=False):
+        return self.call('write_registers', self.remote_write_registers, values, verify)
+
+    def remote_write_registers(self, values, verify=False):
+        results = {}
+        for address, value in values.items():
+            problem = check_register_write(address, value)
+            if problem:
+                error_print("Refusing write: %s", problem)
+                results[address] = False
+        sent = {address: value for address, value in values.items() if address not in results}
+        if sent:
+            op = DAEMON_OP_WRITE_VERIFY if verify else DAEMON_OP_WRITE
+            reply = self.request(op, b''.join(DAEMON_PAIR.pack(a, v) for a, v in sent.items()),
+                                 len(sent))
+            if reply is not None:
+                results.update(zip(sent, (ok for ok, in DAEMON_WRITE_RESULT.iter_unpack(reply))))
+        return {address: results.get(address, False) for address in values}
+
+    def dump_registers(self):
+        return self.call('dump_registers', self.remote_dump_registers)
+
+    def remote_dump_registers(self):
+        reply = self.request(DAEMON_OP_DUMP)
+        return dict(DAEMON_PAIR.iter_unpack(reply)) if reply is not None else {}
+
+    def lock_stats(self):
+        return self.local.lock_stats() if self.local else {}
+
+    def shadow_stats(self):
+        return self.local.shadow_stats() if self.local else {}
+
+class LAN8651Registry:
+    """Every LAN8651 in the system, with one accessor per device
+    
+    Accessors are local LAN8651Debugfs objects, or LAN8651Client
+    connections when lan8651d is running (daemon_path=None forces local
+    access). Devices are named by interface or SPI device (spi<bus>.<cs>).
+    With watch=True, local accessors and the device list follow link
+    events, so driver reloads and SPI rebinds are picked up. Lookups are
+    serialized, so daemon threads share one accessor per device.
+    """
+
+    def __init__(self, daemon_path=DAEMON_SOCKET, watch=False):
+        self.requested_daemon_path = daemon_path
+        self.daemon_path = None
+        self.accessors = {}
+        self.lock = threading.RLock()
+        self._devices = None
+        self.watch = watch
+        # Set by link_event(): the next lookup scans instead of trusting
+        # the discovery cache, which may still look current
+        self.rescan = False
+        # SPI devices bound to lan865x at the last scan, and whether link
+        # events carry parent device attributes (Linux 5.18+)
+        self.bound = None
+        self.parents_known = False
+    
+    @property
+    def devices(self):
+        """Known devices, asked from lan8651d or discovered on first use"""
+        with self.lock:
+            if self._devices is None:
+                path = self.requested_daemon_path
+                client = LAN8651Client.connect(path) if path else None
+                if client:
+                    try:
+                        self._devices = client.list_devices()
+                        self.daemon_path = path
+                    except ConnectionError as e:
+                        debug_print("lan8651d went away (%s), using local access", e)
+                    client.close()
+                if self._devices is None:
+                    self._devices = discover_lan865x_devices(use_cache=not self.rescan)
+                    self.rescan = False
+                    self.bound = read_bound_devices()
+                    if self.watch:
+                        watcher = get_link_watcher()
+                        if watcher:
+                            watcher.watch(self)
+                debug_print("Registry: %s", self._devices)
+            return self._devices
+    
+    @devices.setter
+    def devices(self, devices):
+        self._devices = devices
+
+    def link_event(self, msg_type, link):
+        """Drop the device list when a known interface changes or a new one appears
+        
+        Events of other links (veth, bridges, VLANs, ...) are ignored, so
+        busy container hosts do not rescan on every flag change. Without
+        parent device attributes a new link only counts if the set of
+        devices bound to lan865x changed.
+        """
+        devices = self._devices
+        if devices is None:
+            return
+        known = {info.ifindex: info for info in devices}
+        info = known.get(link['ifindex']) if link else None
+        if link and link['parent_bus']:
+            self.parents_known = True
+        
+        if msg_type is None or (msg_type == RTM_DELLINK and info):
+            stale = True
+        elif msg_type != RTM_NEWLINK:
+            stale = False
+        elif info:
+            stale = info.iface != link['ifname']
+        elif link['parent_bus'] is not None or self.parents_known:
+            stale = link['parent_bus'] == "spi"
+        else:
+            stale = read_bound_devices() != self.bound
+        if stale:
+            debug_print("Registry: device list is out of date")
+            self.rescan = True
+            self._devices = None
+
+    def find(self, name):
+        """Get the LAN8651DeviceInfo for an interface or SPI device name"""
+        with self.lock:
+            for info in self.devices:
+                if info.matches(name):
+                    return info
+            if not self.daemon_path:
+                # Not in the discovery cache; the device may have appeared since
+                self.devices = discover_lan865x_devices(use_cache=False)
+                self.bound = read_bound_devices()
+                for info in self.devices:
+                    if info.matches(name):
+                        return info
+        raise KeyError(f"Unknown LAN8651 device '{name}'")
+
+    def get(self, name=None):
+        """Get the accessor of a device; None selects the first device"""
+        with self.lock:
+            if name:
+                info = self.find(name)
+            else:
+                info = self.devices[0] if self.devices else None
+            key = info.iface if info else None
+            
+            if key not in self.accessors:
+                client = LAN8651Client.connect(self.daemon_path, key) if self.daemon_path else None
+                if client:
+                    self.accessors[key] = client
+                else:
+                    self.accessors[key] = LAN8651Debugfs(info, watch=self.watch)
+            return self.accessors[key]
+
+    def select(self, spec):
+        """Resolve a --device argument (None, 'all' or a name) to device infos"""
+        if spec == "all":
+            return list(self.devices)
+        if spec:
+            return [self.find(spec)]
+        return self.devices[:1] or [None]
+
+    def run(self, spec, func):
+        """Call func(accessor) on every selected device, concurrently
+        
+        Returns a list of (LAN8651DeviceInfo or None, result) in device order;
+        empty for 'all' when there are no devices.
+        """
+        infos = self.select(spec)
+        if not infos:
+            return []
+        if len(infos) == 1:
+            info = infos[0]
+            return [(info, func(self.get(info.iface if info else None)))]
+        
+        # Create the accessors up front so only the register I/O runs in threads
+        from concurrent.futures import ThreadPoolExecutor
+        accessors = [self.get(info.iface) for info in infos]
+        with ThreadPoolExecutor(max_workers=len(infos), thread_name_prefix="lan8651") as pool:
+            results = list(pool.map(func, accessors))
+        return list(zip(infos, results))
+
+    def close(self):
+        with self.lock:
+            for accessor in self.accessors.values():
+                if accessor:
+                    accessor.close()
+            self.accessors.clear()
+
+def parse_ethtool_dump(text):
+    """Parse 'ethtool -d' output into an address -> value dict
+    
+    Every '0x%08x' token followed by a numeric token is taken as an
+    address/value pair; the first occurrence of an address wins.
+    """
+    index = {}
+    for line in text.split('\n'):
+        parts = line.split()
+        i = 0
+        while i + 1 < len(parts):
+            key = parts[i].lower().rstrip(':')
+            if key.startswith('0x') and len(key) == 10:
+                try:
+                    address = int(key, 16)
+                    value = int(parts[i + 1], 0)
+                except ValueError:
+                    i += 1
+                    continue
+                index.setdefault(address, value)
+                i += 2
+            else:
+                i += 1
+    return index
+
+def parse_register_lines(text):
+    """Parse '0x<addr>: 0x<value>' lines into an address -> value dict"""
+    index = {}
+    for line in text.splitlines():
+        address, sep, value = line.partition(':')
+        if not sep:
+            continue
+        try:
+            index[int(address, 16)] = int(value, 16)
+        except ValueError:
+            continue
+    return index
+
+def show_register_info(address, value):
+    """Show detailed register information"""
+    
+    reg_name = get_register_name(address)
+    print(f"\nRegister {reg_name} (0x{address:08x}) = 0x{value:08x} ({value})")
+    print(f"Binary: {value:032b}")
+    
+    info = get_register_info(address)
+    if info:
+        reset = "unknown" if info.reset is None else f"0x{info.reset:0{info.width // 4}x}"
+        print(f"Access: {info.access}, {info.width}-bit{', volatile' if info.volatile else ''}"
+              f"{', read has side effects' if info.side_effects else ''}, reset value {reset}")
+    
+    # Show bit field interpretation if available
+    bit_desc = decode_register_bits(address, value)
+    if bit_desc:
+        print(f"{bit_desc}")
+    
+    # Show register description if known
+    if reg_name in ['OA_STATUS0', 'OA_STATUS1']:
+        print("Status register - shows current device state")
+    elif reg_name in ['MAC_NCR', 'MAC_NCFGR']:
+        print("MAC control register - controls network operations")
+    elif reg_name in ['BASIC_CONTROL', 'BASIC_STATUS']:
+        print("PHY basic register - standard IEEE 802.3 functionality")
+        print(f"Name: {reg_name}")
+        
+        # Decode specific registers
+        if address == 0x10000:  # ID_REV
+            chip_id = (value >> 16) & 0xFFFF
+            rev_id = value & 0xFFFF
+            print(f"Chip ID: 0x{chip_id:04x}, Revision: 0x{rev_id:04x}")
+        
+        elif address == 0x10001:  # STATUS0
+            print(f"TX_FRAME_CHECK_SEQUENCE_ERROR: {(value >> 0) & 1}")
+            print(f"TX_FRAME_ERROR: {(value >> 1) & 1}")
+            print(f"TX_BUFFER_OVERFLOW_ERROR: {(value >> 2) & 1}")
+            print(f"TX_FIFO_UNDERFLOW: {(value >> 3) & 1}")
+            print(f"RX_FIFO_OVERFLOW: {(value >> 4) & 1}")
+            print(f"RX_HEADER_ERROR: {(value >> 5) & 1}")
+        
+        elif address == 0x10003:  # CONFIG0
+            print(f"PROTECTED: {(value >> 2) & 1}")
+            print(f"TX_CUT_THROUGH: {(value >> 4) & 1}")
+            print(f"RX_CUT_THROUGH: {(value >> 5) & 1}")
+
+def format_list_value(values, address):
+    """Format the current value column of the list command"""
+    if address in values:
+        return f"  : 0x{values[address]:08X}"
+    return ""
+
+def pop_option(args, name):
+    """Remove '<name> <value>' or '<name>=<value>' from args and return the value"""
+    for i, arg in enumerate(args):
+        if arg == name and i + 1 < len(args):
+            value = args[i + 1]
+            del args[i:i + 2]
+            return value
+        if arg.startswith(name + "="):
+            del args[i]
+            return arg.split("=", 1)[1]
+    return None
+
+def print_device_header(info, results):
+    """Print which device the following output belongs to, if there are several"""
+    if len(results) > 1:
+        print(f"\n##### {info.label} #####")
+
+def main():
+    setup_logging()
+    args = sys.argv[1:]
+    device_spec = pop_option(args, "--device")
+    verify = "--verify" in args
+    if verify:
+        args.remove("--verify")
+    
+    if not args:
+        print("Usage: python3 lan8651_kernelfs.py [--device <name>|all] <command> [args...]")
+        print("Commands:")
+        print("  read <address>... - Read registers (address can be hex or register name)")
+        print("  write <addr> <val> [--verify] - Write register (optionally read back)")
+        print("  list [--values]   - List known registers (optionally with current values)")
+        print("  status            - Show device status")
+        print("  daemon [socket]   - Run lan8651d, serving the commands above over a Unix socket")
+        print("\nOptions:")
+        print("  --device <name>   - Interface (eth1) or SPI device (spi0.0); default: first found")
+        print("  --device all      - Run the command on every LAN8651, concurrently")
+        print("\nExamples:")
+        print("  python3 lan8651_kernelfs.py read 0x10000")
+        print("  python3 lan8651_kernelfs.py read OA_STATUS0")
+        print("  python3 lan8651_kernelfs.py read OA_STATUS0 OA_STATUS1 OA_BUFSTS")
+        print("  python3 lan8651_kernelfs.py write MAC_NCR 0x0C")
+        print("  python3 lan8651_kernelfs.py list")
+        print("  python3 lan8651_kernelfs.py --device all status")
+        print("\nWhen lan8651d is running (socket: $LAN8651_SOCKET, default")
+        print(f"{DAEMON_SOCKET}), commands are forwarded to it.")
+        return
+    
+    command = args[0]
+    if command == "daemon":
+        from lan8651d import run_daemon
+        return run_daemon(args[1] if len(args) > 1 else DAEMON_SOCKET)
+    
+    # Devices are served by the resident daemon when it is running,
+    # accessed locally otherwise
+    # Nothing touches the device (or the daemon) before the first access;
+    # plain 'list' only prints the register table
+    registry = LAN8651Registry()
+    try:
+        if device_spec and (command != "list" or "--values" in args[1:]):
+            if not registry.select(device_spec):
+                print("No LAN8651 devices found")
+                registry.close()
+                return
+    except KeyError as e:
+        print(f"Error: {e.args[0]}")
+        print(f"Available devices: {', '.join(d.label for d in registry.devices) or 'none'}")
+        registry.close()
+        return
+    
+    if command == "list":
+        results = [(None, {})]
+        if "--values" in args[1:]:
+            results = registry.run(device_spec, lambda dev: dev.dump_registers())
+        
+        for info, values in results:
+            print_device_header(info, results)
+            print("\nKnown LAN8651 Registers:")
+            print("=" * 60)
+            
+            # Group registers by type
+            std_regs = [(name, addr) for name, addr in LAN8651_REGISTERS.items() 
+                       if addr < 0x10000]
+            mac_regs = [(name, addr) for name, addr in LAN8651_REGISTERS.items() 
+                       if 0x10000 <= addr < 0x20000]
+                       
+            if std_regs:
+                print("\nStandard/PHY Registers (MMS 0):")
+                for name, addr in sorted(std_regs, key=lambda x: x[1]):
+                    print(f"  {name:<15} = 0x{addr:08X}{format_list_value(values, addr)}")
+                    
+            if mac_regs:
+                print("\nMAC Registers (MMS 1):")  
+                for name, addr in sorted(mac_regs, key=lambda x: x[1]):
+                    print(f"  {name:<15} = 0x{addr:08X}{format_list_value(values, addr)}")
+        
+    elif command == "read":
+        if len(args) < 2:
+            print("Error: Address required for read command")
+            return
+        
+        try:
+            addresses = [parse_register_address(arg) for arg in args[1:]]
         except ValueError as e:
             print(f"Error: {e}")
+            return
+        
+        results = registry.run(device_spec, lambda dev: dev.read_registers(addresses))
+        for info, values in results:
+            print_device_header(info, results)
+            for address, value in values.items():
+                if value is not None:
+                    show_register_info(address, value)
+                else:
+                    print(f"Failed to read register {get_register_name(address)}")
             
-    elif sys.argv[1] == "status":
-        print("\nLAN8651 Status Information:")
-        print("=" * 40)
+    elif command == "write":
+        if len(args) < 3:
+            print("Error: Address and value required for write command")
+            return
         
+        try:
+            address = parse_register_address(args[1])
+            value = parse_register_value(args[2])  # Auto-detect hex/decimal
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        
+        results = registry.run(device_spec,
+                               lambda dev: dev.write_register(address, value, verify=verify))
+        for info, ok in results:
+            print_device_header(info, results)
+            if ok:
+                reg_name = get_register_name(address)
+                print(f"Successfully wrote {reg_name} (0x{address:08X}) = 0x{value:08X}"
+                      f"{' (verified)' if verify else ''}")
+            else:
+                print("Failed to write register")
+            
+    elif command == "status":
         # Read key status registers
         status_regs = [
             ('OA_STATUS0', 'General Status'),
@@ -470,20 +3300,35 @@ def main():
             ('OA_BUFSTS', 'Buffer Status')
         ]
         
-        for reg_name, description in status_regs:
-            try:
-                address = LAN8651_REGISTERS[reg_name]
-                value = debugfs.read_register(address)
-                if value is not None:
-                    print(f"\n{description}:")
-                    show_register_info(address, value)
-                else:
-                    print(f"\n{description}: Failed to read")
-            except KeyError:
-                print(f"\n{description}: Register not defined")
+        # One batch for all of them, so dump-based backends run once
+        addresses = [LAN8651_REGISTERS[reg_name] for reg_name, _ in status_regs
+                     if reg_name in LAN8651_REGISTERS]
+        results = registry.run(device_spec, lambda dev: dev.read_registers(addresses))
+        
+        for info, values in results:
+            print_device_header(info, results)
+            print("\nLAN8651 Status Information:")
+            print("=" * 40)
+            
+            for reg_name, description in status_regs:
+                try:
+                    address = LAN8651_REGISTERS[reg_name]
+                    value = values.get(address)
+                    if value is not None:
+                        print(f"\n{description}:")
+                        show_register_info(address, value)
+                    else:
+                        print(f"\n{description}: Failed to read")
+                except KeyError:
+                    print(f"\n{description}: Register not defined")
     else:
-        print(f"Error: Unknown command '{sys.argv[1]}'")
+        print(f"Error: Unknown command '{command}'")
         print("Use 'python3 lan8651_kernelfs.py' for usage help")
+    
+    for name, accessor in registry.accessors.items():
+        debug_print("Device lock %s: %s", name, accessor.lock_stats())
+        debug_print("Shadow cache %s: %s", name, accessor.shadow_stats())
+    registry.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
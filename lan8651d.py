@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+lan8651d - resident LAN8651 register access daemon
+
+Keeps register access warm and serves lan8651_kernelfs.py clients over
+a Unix socket. Same as 'lan8651_kernelfs.py daemon [socket]'. Kept out of
+lan8651_kernelfs.py so CLI runs do not import socketserver.
+"""
+import errno
+import os
+import socket
+import socketserver
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from lan8651_kernelfs import (DAEMON_MAX_MESSAGE, DAEMON_SOCKET, LAN8651Client,
+                              LAN8651Registry, debug_print, error_print,
+                              handle_daemon_request, info_print, setup_logging)
+
+class LAN8651RequestHandler(socketserver.BaseRequestHandler):
+    """Serve the requests of one lan8651d client connection"""
+
+    def handle(self):
+        while True:
+            request = self.request.recv(DAEMON_MAX_MESSAGE)
+            if not request:
+                break
+            self.request.send(handle_daemon_request(self.server.registry, request))
+
+class LAN8651Daemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """lan8651d: keeps every LAN8651 accessor warm and serves them on a Unix socket"""
+
+    socket_type = socket.SOCK_SEQPACKET
+    daemon_threads = True
+
+    def __init__(self, path=DAEMON_SOCKET, registry=None):
+        if os.path.exists(path):
+            client = LAN8651Client.connect(path)
+            if client:
+                client.close()
+                raise OSError(errno.EADDRINUSE, f"lan8651d already running on {path}")
+            debug_print("Removing stale socket %s", path)
+            os.unlink(path)
+        self.registry = registry if registry is not None else LAN8651Registry(daemon_path=None, watch=True)
+        super().__init__(path, LAN8651RequestHandler)
+        os.chmod(path, 0o660)
+        info_print("lan8651d listening on %s (%d devices)", path, len(self.registry.devices))
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+        self.registry.close()
+
+def run_daemon(path=DAEMON_SOCKET):
+    """Run lan8651d in the foreground until interrupted"""
+    setup_logging()
+    try:
+        server = LAN8651Daemon(path)
+    except OSError as e:
+        error_print("Cannot start lan8651d: %s", e)
+        return 1
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    exit(run_daemon(sys.argv[1] if len(sys.argv) > 1 else DAEMON_SOCKET))
@@ -0,0 +1,682 @@
+#!/usr/bin/env python3
+"""
+Tests for lan8651_kernelfs.py that need no hardware
+
+Register access runs against TC6Simulator; kernel interfaces are fed
+hand-built data. Run with 'python3 -m pytest'.
+"""
+import os
+import struct
+import threading
+
+import pytest
+
+import lan8651_kernelfs as m
+
+R = m.LAN8651_REGISTERS
+
+def make_device(registers=None):
+    """LAN8651Debugfs backed only by a TC6Simulator"""
+    device = m.LAN8651Debugfs(spidev='sim')
+    device.sysfs_path = None
+    device.debugfs_path = None
+    device.tc6 = m.TC6Backend(m.TC6Simulator(registers))
+    return device
+
+@pytest.fixture
+def device():
+    device = make_device()
+    yield device
+    device.close()
+
+# TC6 framing
+
+@pytest.mark.parametrize('word', [0, 1, 0x2, 0x80000000, 0xfffffffe, 0x12345678])
+def test_tc6_parity_makes_header_odd(word):
+    header = (word & ~1) | m.tc6_parity(word)
+    assert bin(header).count('1') % 2 == 1
+
+@pytest.mark.parametrize('address, count, write', [
+    (0x0000, 1, False),
+    (0x10000, 1, True),
+    (0x10020, 4, False),
+    (0x4FFFF, m.TC6_MAX_BURST, True),
+])
+def test_tc6_header_round_trip(address, count, write):
+    header = m.tc6_control_header(address, count, write)
+    assert m.tc6_parse_header(header) == (address, count, write)
+    assert m.tc6_parity(header) == header & 1
+
+def test_tc6_header_fields():
+    header = m.tc6_control_header(0x10001, 2, write=True)
+    assert header & m.TC6_HEADER_WNR
+    assert (header >> 24) & 0xF == 1            # MMS
+    assert (header >> 8) & 0xFFFF == 0x0001     # register address
+    assert (header >> 1) & 0x7F == 1            # count - 1
+
+@pytest.mark.parametrize('count', [0, m.TC6_MAX_BURST + 1])
+def test_tc6_header_rejects_bad_length(count):
+    with pytest.raises(ValueError):
+        m.tc6_control_header(0x10000, count)
+
+def test_tc6_backend_burst_read_write():
+    sim = m.TC6Simulator({0x10000: 0x0C})
+    tc6 = m.TC6Backend(sim)
+    tc6.write_burst(0x10022, [0x44332211, 0x6655])
+    assert sim.registers[0x10022] == 0x44332211
+    assert sim.registers[0x10023] == 0x6655
+    assert tc6.read_burst(0x10022, 2) == [0x44332211, 0x6655]
+    assert tc6.read(0x10000) == 0x0C
+    assert sim.transactions == 3
+
+def test_tc6_backend_detects_bad_parity():
+    class FlipParity(m.TC6Simulator):
+        def transfer(self, tx):
+            header, = struct.unpack_from('>I', tx)
+            return super().transfer(struct.pack('>I', header ^ 1) + tx[4:])
+
+    tc6 = m.TC6Backend(FlipParity())
+    with pytest.raises(m.TC6Error):
+        tc6.read_burst(0x10000, 1)
+    assert tc6.read(0x10000) is None
+
+def test_tc6_backend_detects_echo_mismatch():
+    class WrongEcho(m.TC6Simulator):
+        def transfer(self, tx):
+            rx = bytearray(super().transfer(tx))
+            rx[7] ^= 0x80
+            return bytes(rx)
+
+    with pytest.raises(m.TC6Error):
+        m.TC6Backend(WrongEcho()).read_burst(0x10000, 1)
+
+# Backend selection
+
+class FakeBackend(m.RegisterBackend):
+    """Backend serving a fixed register map and counting its calls"""
+
+    def __init__(self, name, registers, failing=False):
+        super().__init__(name, self.read_one)
+        self.registers = registers
+        self.failing = failing
+        self.calls = 0
+
+    def read_one(self, address):
+        self.calls += 1
+        if self.failing:
+            return None
+        return self.registers.get(address, m.NOT_AVAILABLE)
+
+def use_backends(device, *backends):
+    device.get_backends = lambda: list(backends)
+    return backends
+
+def test_backend_not_providing_register_stays_selected(device):
+    regmap, spi = use_backends(device, FakeBackend('map', {0x30000: 1}),
+                               FakeBackend('spi', {0x30000: 1, 0x30001: 2}))
+    assert device.read_register(0x30000) == 1
+    assert device.active_backend is regmap
+    # Not in the map: served by the next backend, the map stays selected
+    assert device.read_register(0x30001) == 2
+    assert device.active_backend is regmap
+    assert not device.failed_backends
+    assert device.read_register(0x30000) == 1
+    assert spi.calls == 1
+
+def test_failed_backend_is_skipped_then_retried(device, monkeypatch):
+    broken, spi = use_backends(device, FakeBackend('broken', {}, failing=True),
+                               FakeBackend('spi', {0x30000: 5}))
+    assert device.read_register(0x30000) == 5
+    assert device.active_backend is spi
+    assert 'broken' in device.failed_backends
+    
+    # Re-probing skips the failed backend during BACKEND_RETRY_INTERVAL
+    device.active_backend = None
+    assert device.read_register(0x30000) == 5
+    assert broken.calls == 1
+    
+    monkeypatch.setattr(m, 'BACKEND_RETRY_INTERVAL', 0.0)
+    device.active_backend = None
+    assert device.read_register(0x30000) == 5
+    assert broken.calls == 2
+
+def test_all_backends_failed_probes_all_again(device):
+    broken, spi = use_backends(device, FakeBackend('broken', {}, failing=True),
+                               FakeBackend('spi', {0x30000: 5}, failing=True))
+    assert device.read_register(0x30000) is None
+    assert set(device.failed_backends) == {'broken', 'spi'}
+    spi.failing = False
+    assert device.read_register(0x30000) == 5
+    assert device.active_backend is spi
+    assert broken.calls == 2
+
+# Shadow register cache
+
+def test_shadow_serves_configuration_registers(device):
+    sim = device.tc6.transport
+    assert device.write_register(R['MAC_SAB2'], 0x1234)
+    before = sim.transactions
+    assert device.read_register(R['MAC_SAB2']) == 0x1234
+    assert sim.transactions == before
+    assert device.shadow_stats()['hits'] == 1
+
+def test_shadow_skips_volatile_and_driver_written_registers(device):
+    sim = device.tc6.transport
+    for name in ('MAC_NCR', 'OA_STATUS0'):
+        device.read_register(R[name])
+        sim.registers[R[name]] = 0x4
+        assert device.read_register(R[name]) == 0x4
+
+def test_shadow_invalidated_by_reset(device):
+    sim = device.tc6.transport
+    device.write_register(R['MAC_SAB2'], 0x1234)
+    device.write_register(R['OA_RESET'], 1)
+    sim.registers[R['MAC_SAB2']] = 0
+    assert device.read_register(R['MAC_SAB2']) == 0
+
+def test_shadow_invalidated_by_link_change(device):
+    sim = device.tc6.transport
+    device.device_info = m.LAN8651DeviceInfo("eth1", "spi0.0", ifindex=3)
+    device.write_register(R['MAC_SAB2'], 0x1234)
+    sim.registers[R['MAC_SAB2']] = 0x5678
+    device.link_event(m.RTM_NEWLINK, {'ifindex': 9, 'ifname': "veth0", 'parent': None})
+    assert device.read_register(R['MAC_SAB2']) == 0x1234
+    device.link_event(m.RTM_NEWLINK, {'ifindex': 3, 'ifname': "eth1", 'parent': "spi0.0"})
+    assert device.read_register(R['MAC_SAB2']) == 0x5678
+    assert not device.stale_reason
+
+# Burst planning
+
+def test_plan_burst_reads_merges_consecutive():
+    addresses = [0x10001, 0x10000, 0x10002, 0x10020, 0x10021, 0x0008]
+    assert m.plan_burst_reads(addresses) == [(0x0008, 1), (0x10000, 3), (0x10020, 2)]
+
+def test_plan_burst_reads_splits_at_mms_and_max_burst():
+    assert m.plan_burst_reads([0xFFFF, 0x10000]) == [(0xFFFF, 1), (0x10000, 1)]
+    assert m.plan_burst_reads(range(0x10000, 0x10005), max_burst=2) == \
+        [(0x10000, 2), (0x10002, 2), (0x10004, 1)]
+
+def test_plan_burst_writes_keeps_order():
+    values = {0x10023: 4, 0x10022: 3, 0x10024: 5, 0x10000: 0x0C}
+    assert m.plan_burst_writes(values) == [(0x10023, [4]), (0x10022, [3]), (0x10024, [5]),
+                                           (0x10000, [0x0C])]
+    values = {0x10022: 1, 0x10023: 2, 0x10000: 0x0C}
+    assert m.plan_burst_writes(values) == [(0x10022, [1, 2]), (0x10000, [0x0C])]
+
+def test_read_many_uses_bursts():
+    sim = m.TC6Simulator({0x10000 + i: i for i in range(8)})
+    tc6 = m.TC6Backend(sim)
+    assert tc6.read_many(range(0x10000, 0x10008)) == {0x10000 + i: i for i in range(8)}
+    assert sim.transactions == 1
+    assert tc6.transactions_saved == 7
+
+# Netlink parsing
+
+def netlink_attribute(nla_type, data):
+    length = m.NLA_HEADER.size + len(data)
+    return m.NLA_HEADER.pack(length, nla_type) + data + bytes(-length % 4)
+
+def link_payload(ifindex, ifname, parent=None, parent_bus=None, flags=0):
+    payload = m.IFINFOMSG.pack(0, m.ARPHRD_ETHER, ifindex, flags, 0)
+    payload += netlink_attribute(m.IFLA_IFNAME, ifname.encode() + b'\0')
+    if parent is not None:
+        payload += netlink_attribute(m.IFLA_PARENT_DEV_NAME, parent.encode() + b'\0')
+    if parent_bus is not None:
+        payload += netlink_attribute(m.IFLA_PARENT_DEV_BUS_NAME, parent_bus.encode() + b'\0')
+    return payload
+
+def test_parse_netlink_attributes_aligns_and_masks_type():
+    data = netlink_attribute(1, b'abcde') + netlink_attribute(0x8000 | 2, b'\x01\x02')
+    attributes = m.parse_netlink_attributes(data)
+    assert bytes(attributes[1]) == b'abcde'
+    assert bytes(attributes[2]) == b'\x01\x02'
+
+def test_parse_netlink_attributes_stops_on_bad_length():
+    data = netlink_attribute(1, b'ok') + m.NLA_HEADER.pack(2, 3)
+    assert list(m.parse_netlink_attributes(data)) == [1]
+
+def test_parse_link_message():
+    link = m.parse_link_message(link_payload(7, "eth1", "spi0.0", "spi", flags=1))
+    assert link == {'ifindex': 7, 'type': m.ARPHRD_ETHER, 'flags': 1, 'ifname': "eth1",
+                    'parent': "spi0.0", 'parent_bus': "spi"}
+
+def test_parse_link_message_without_parent():
+    link = m.parse_link_message(link_payload(1, "lo"))
+    assert link['ifname'] == "lo"
+    assert link['parent'] is None and link['parent_bus'] is None
+
+# lan8651d framing
+
+class FakeRegistry:
+    """Registry with one simulated device, as the daemon sees it"""
+
+    def __init__(self, device):
+        self.device = device
+        self.devices = [m.LAN8651DeviceInfo("eth1", "spi0.0")]
+
+    def get(self, name=None):
+        if name not in (None, "eth1"):
+            raise KeyError(name)
+        return self.device
+
+def daemon_request(op, entries=b'', count=0, name=b''):
+    return m.DAEMON_HEADER.pack(op, count, len(name)) + name + entries
+
+def daemon_reply(reply):
+    status, count, _ = m.DAEMON_HEADER.unpack_from(reply)
+    return status, count, reply[m.DAEMON_HEADER.size:]
+
+def test_daemon_read_request(device):
+    device.tc6.transport.registers.update({0x10000: 0x0C, 0x10001: 0x80})
+    registry = FakeRegistry(device)
+    addresses = [0x10000, 0x10001]
+    request = daemon_request(m.DAEMON_OP_READ,
+                             b''.join(m.DAEMON_ADDRESS.pack(a) for a in addresses),
+                             len(addresses), b"eth1")
+    status, count, body = daemon_reply(m.handle_daemon_request(registry, request))
+    assert (status, count) == (m.DAEMON_STATUS_OK, 2)
+    assert list(m.DAEMON_READ_RESULT.iter_unpack(body)) == [(True, 0x0C), (True, 0x80)]
+
+def test_daemon_write_request(device):
+    registry = FakeRegistry(device)
+    request = daemon_request(m.DAEMON_OP_WRITE, m.DAEMON_PAIR.pack(R['MAC_SAB2'], 0x1234), 1)
+    status, count, body = daemon_reply(m.handle_daemon_request(registry, request))
+    assert (status, count) == (m.DAEMON_STATUS_OK, 1)
+    assert m.DAEMON_WRITE_RESULT.unpack(body) == (True,)
+    assert device.tc6.transport.registers[R['MAC_SAB2']] == 0x1234
+
+def test_daemon_list_request(device):
+    status, count, body = daemon_reply(
+        m.handle_daemon_request(FakeRegistry(device), daemon_request(m.DAEMON_OP_LIST)))
+    assert (status, count, body) == (m.DAEMON_STATUS_OK, 1, b"eth1 spi0.0\n")
+
+@pytest.mark.parametrize('request_bytes', [
+    b'\x01',                                            # truncated header
+    daemon_request(99),                                 # unknown op
+    daemon_request(m.DAEMON_OP_READ, name=b"eth9"),     # unknown device
+])
+def test_daemon_bad_request(device, request_bytes):
+    status, count, _ = daemon_reply(m.handle_daemon_request(FakeRegistry(device), request_bytes))
+    assert (status, count) == (m.DAEMON_STATUS_ERROR, 0)
+
+def test_daemon_device_error_is_reported(device):
+    def fail(addresses):
+        raise OSError(5, "device gone")
+    device.read_registers = fail
+    request = daemon_request(m.DAEMON_OP_READ, m.DAEMON_ADDRESS.pack(0x10000), 1)
+    status, _, _ = daemon_reply(m.handle_daemon_request(FakeRegistry(device), request))
+    assert status == m.DAEMON_STATUS_ERROR
+
+@pytest.fixture
+def daemon(device, tmp_path):
+    """lan8651d serving the simulated device; yields the socket path"""
+    lan8651d = pytest.importorskip("lan8651d")
+    path = str(tmp_path / "lan8651d.sock")
+    server = lan8651d.LAN8651Daemon(path, registry=FakeRegistry(device))
+    server.registry.close = lambda: None
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    assert not os.path.exists(path)
+
+def test_daemon_client_round_trip(device, daemon):
+    device.tc6.transport.registers[0x10000] = 0x0C
+    client = m.LAN8651Client.connect(daemon, "eth1")
+    assert client is not None
+    assert client.read_register(0x10000) == 0x0C
+    assert client.write_register(R['MAC_SAT2'], 0x55) is True
+    assert client.list_devices()[0].iface == "eth1"
+    client.close()
+
+def test_daemon_client_device_error(device, daemon):
+    def fail(*args):
+        raise OSError(5, "device gone")
+    device.read_registers = fail
+    device.write_register = fail
+    device.dump_registers = fail
+    client = m.LAN8651Client.connect(daemon, "eth1")
+    # Same shape as a failed local access
+    assert client.read_registers([0x10000, 0x10001]) == {0x10000: None, 0x10001: None}
+    assert client.write_register(R['MAC_SAT2'], 0x55) is False
+    assert client.write_registers({R['MAC_SAB2']: 1, 0x100000: 2}) == \
+        {R['MAC_SAB2']: False, 0x100000: False}
+    assert client.dump_registers() == {}
+    assert client.local is None
+    client.close()
+
+def test_daemon_refuses_second_instance(device, daemon):
+    lan8651d = pytest.importorskip("lan8651d")
+    with pytest.raises(OSError):
+        lan8651d.LAN8651Daemon(daemon, registry=FakeRegistry(device))
+
+# Transactions
+
+def test_transaction_queues_and_flushes_in_order(device):
+    sim = device.tc6.transport
+    with device.transaction() as t:
+        device.write_register(R['MAC_SAB2'], 1)
+        device.write_register(R['MAC_SAT2'], 2)
+        device.write_register(R['MAC_NCR'], 0x0C)
+        assert sim.transactions == 0
+    assert t.results == {R['MAC_SAB2']: True, R['MAC_SAT2']: True, R['MAC_NCR']: True}
+    assert [sim.registers[R[name]] for name in ('MAC_SAB2', 'MAC_SAT2', 'MAC_NCR')] == [1, 2, 0x0C]
+
+def test_transaction_last_write_wins(device):
+    with device.transaction():
+        device.write_register(R['MAC_SAB2'], 1)
+        device.write_register(R['MAC_SAB2'], 2)
+    assert device.tc6.transport.registers[R['MAC_SAB2']] == 2
+
+def test_transaction_dropped_on_exception(device):
+    with pytest.raises(RuntimeError):
+        with device.transaction():
+            device.write_register(R['MAC_SAB2'], 1)
+            raise RuntimeError("abort")
+    assert R['MAC_SAB2'] not in device.tc6.transport.registers
+
+def test_transaction_rmw_uses_queued_value(device):
+    with device.transaction():
+        device.set_bits(R['MAC_NCR'], 0x4)
+        device.set_bits(R['MAC_NCR'], 0x8)
+    assert device.tc6.transport.registers[R['MAC_NCR']] == 0x0C
+
+def test_transaction_partial_failure(device):
+    write_burst = device.tc6.write_burst
+
+    def failing_write_burst(address, values):
+        if address == R['MAC_NCR']:
+            raise OSError(5, "EIO")
+        write_burst(address, values)
+
+    device.tc6.write_burst = failing_write_burst
+    with device.transaction() as t:
+        device.write_register(R['MAC_SAB2'], 1)
+        device.write_register(R['MAC_NCR'], 0x0C)
+        device.write_register(R['MAC_SAT2'], 2)
+    assert t.results[R['MAC_SAB2']] is True
+    assert not t.results[R['MAC_NCR']]
+    assert not t.results[R['MAC_SAT2']]
+
+# Link events
+
+@pytest.fixture
+def watched_registry(tmp_path, monkeypatch):
+    """Registry that has discovered eth1 (ifindex 3) on spi0.0"""
+    driver_dir = tmp_path / "lan865x"
+    (driver_dir / "spi0.0").mkdir(parents=True)
+    monkeypatch.setattr(m, 'LAN865X_DRIVER_DIR', str(driver_dir))
+    registry = m.LAN8651Registry(daemon_path=None)
+    registry.devices = [m.LAN8651DeviceInfo("eth1", "spi0.0", ifindex=3)]
+    registry.bound = m.read_bound_devices()
+    return registry, driver_dir
+
+def link_event(registry, msg_type, *args, **kwargs):
+    registry.link_event(msg_type, m.parse_link_message(link_payload(*args, **kwargs)))
+    return registry._devices is None
+
+def test_registry_ignores_virtual_links(watched_registry):
+    registry, _ = watched_registry
+    assert not link_event(registry, m.RTM_NEWLINK, 9, "veth1a2b")
+    assert not link_event(registry, m.RTM_NEWLINK, 3, "eth1", flags=1)
+    assert not registry.rescan
+
+def test_registry_rescans_for_new_spi_link(watched_registry):
+    registry, _ = watched_registry
+    assert not link_event(registry, m.RTM_NEWLINK, 10, "eth0", "0000:00:1f.6", "pci")
+    assert link_event(registry, m.RTM_NEWLINK, 11, "eth2", "spi1.0", "spi")
+    assert registry.rescan
+
+def test_registry_rescans_for_renamed_or_removed_link(watched_registry):
+    registry, _ = watched_registry
+    assert link_event(registry, m.RTM_NEWLINK, 3, "lan0")
+    registry.devices = [m.LAN8651DeviceInfo("eth1", "spi0.0", ifindex=3)]
+    assert link_event(registry, m.RTM_DELLINK, 3, "eth1")
+
+def test_registry_without_parent_info_checks_bound_devices(watched_registry):
+    registry, driver_dir = watched_registry
+    assert not link_event(registry, m.RTM_NEWLINK, 9, "veth1a2b")
+    (driver_dir / "spi1.0").mkdir()
+    assert link_event(registry, m.RTM_NEWLINK, 11, "eth2")
+
+# reg_access on an older patch (no range reads, values in the kernel log)
+
+class OldRegAccess:
+    """Older reg_access: every 'read <addr> ...' reads one register and
+    logs it; clear-on-read registers return 0 on the next read"""
+
+    def __init__(self, registers):
+        import socket
+        self.registers = dict(registers)
+        self.reads = []
+        self.kmsg, self.kernel = socket.socketpair(socket.AF_UNIX, socket.SOCK_SEQPACKET)
+        self.kmsg.setblocking(False)
+        self.seq = 100
+
+    def transfer(self, name, command, size=64):
+        address = int(command.split()[1], 16)
+        self.reads.append(address)
+        value = self.registers.pop(address, 0)
+        self.seq += 1
+        self.kernel.send(f"6,{self.seq},0,-;lan865x spi0.0: REG READ 0x{address:08x} = "
+                         f"0x{value:08x}\n".encode())
+        return "" if size else None
+
+@pytest.fixture
+def old_reg_access(device, tmp_path):
+    patch = OldRegAccess({R['STATS0']: 7, R['STATS1']: 9})
+    device.debugfs_path = str(tmp_path)
+    device.debugfs_transfer = patch.transfer
+    device.kmsg_fd = patch.kmsg.fileno()
+    yield patch
+    device.kmsg_fd = None
+    patch.kmsg.close()
+    patch.kernel.close()
+
+def test_range_probe_value_taken_from_kernel_log(device, old_reg_access):
+    assert device.read_via_reg_access(R['STATS0']) == 7
+    assert device.reg_access_range is False
+    assert old_reg_access.reads == [R['STATS0']]
+
+def test_range_probe_value_used_in_batch(device, old_reg_access):
+    values = device.read_many_via_reg_access([R['STATS0'], R['STATS1']])
+    assert values == {R['STATS0']: 7, R['STATS1']: 9}
+    assert old_reg_access.reads == [R['STATS0'], R['STATS1']]
+
+# Discovery cache
+
+@pytest.fixture
+def fake_sysfs(tmp_path, monkeypatch):
+    """Fake /sys and /proc tree with eth1 on spi0.0; yields its root"""
+    lan8651_benchmark = pytest.importorskip("lan8651_benchmark")
+    root = str(tmp_path / "root")
+    lan8651_benchmark.make_fake_sysfs(root)
+    monkeypatch.setattr(m, 'SYSFS_ROOT', root)
+    monkeypatch.setattr(m, 'SYS_CLASS_NET', f"{root}/sys/class/net")
+    monkeypatch.setattr(m, 'DEBUGFS_ROOT', f"{root}/sys/kernel/debug")
+    monkeypatch.setattr(m, 'BOOT_ID_PATH', f"{root}/proc/sys/kernel/random/boot_id")
+    monkeypatch.setattr(m, 'LAN865X_DRIVER_DIR', f"{root}/sys/bus/spi/drivers/lan865x")
+    monkeypatch.setattr(m, 'DISCOVERY_CACHE', str(tmp_path / "discovery.json"))
+    return root
+
+def test_discovery_cache_round_trip(fake_sysfs):
+    devices = m.discover_lan865x_devices(use_cache=False)
+    assert [(d.iface, d.spi_device) for d in devices] == [("eth1", "spi0.0")]
+    cached = m.load_discovery_cache()
+    assert [(d.iface, d.spi_device, d.ifindex) for d in cached] == [("eth1", "spi0.0", 3)]
+
+def test_discovery_cache_rejects_other_boot(fake_sysfs):
+    m.discover_lan865x_devices(use_cache=False)
+    with open(m.BOOT_ID_PATH, 'w') as f:
+        f.write("11111111-1111-1111-1111-111111111111\n")
+    assert m.load_discovery_cache() is None
+
+def test_discovery_cache_rejects_new_bound_device(fake_sysfs):
+    m.discover_lan865x_devices(use_cache=False)
+    os.mkdir(f"{m.LAN865X_DRIVER_DIR}/spi1.0")
+    assert m.load_discovery_cache() is None
+
+def test_discovery_cache_rejects_changed_ifindex(fake_sysfs):
+    m.discover_lan865x_devices(use_cache=False)
+    with open(f"{m.SYS_CLASS_NET}/eth1/ifindex", 'w') as f:
+        f.write("7\n")
+    assert m.load_discovery_cache() is None
+
+def test_discovery_cache_rejects_corrupt_file(fake_sysfs):
+    with open(m.DISCOVERY_CACHE, 'w') as f:
+        f.write("{not json")
+    assert m.load_discovery_cache() is None
+
+# Kernel log correlation
+
+def kmsg_record(patch, message):
+    patch.seq += 1
+    patch.kernel.send(f"6,{patch.seq},0,-;{message}\n".encode())
+
+def test_kmsg_skips_records_logged_before_the_command(device, old_reg_access):
+    stats0 = R['STATS0']
+    kmsg_record(old_reg_access, f"lan865x spi0.0: REG READ 0x{stats0:08x} = 0x00000063")
+    assert device.read_via_reg_access_kmsg(stats0) == 7
+
+def test_kmsg_ignores_records_of_other_registers(device, old_reg_access):
+    stats0, stats1 = R['STATS0'], R['STATS1']
+    transfer = old_reg_access.transfer
+
+    def interleaved(name, command, size=64):
+        kmsg_record(old_reg_access, f"lan865x spi0.0: REG READ 0x{stats1:08x} = 0x00000009")
+        kmsg_record(old_reg_access, "eth1: Link is Up - 10Mbps/Half")
+        return transfer(name, command, size)
+
+    device.debugfs_transfer = interleaved
+    assert device.read_via_reg_access_kmsg(stats0) == 7
+
+def test_kmsg_times_out_without_record(device, old_reg_access, monkeypatch):
+    monkeypatch.setattr(m, 'KMSG_REPLY_TIMEOUT', 0.01)
+    device.debugfs_transfer = lambda name, command, size=64: None
+    assert device.read_via_reg_access_kmsg(R['STATS0']) is None
+
+# asyncio front end
+
+class SlowDevice:
+    """Device whose batch reads block until released, counting them"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = []
+
+    def read_registers(self, addresses):
+        self.batches.append(list(addresses))
+        self.release.wait(5)
+        return {address: address & 0xFF for address in addresses}
+
+    def close(self):
+        pass
+
+def test_async_reads_coalesce():
+    import asyncio
+    slow = SlowDevice()
+
+    async def run():
+        async with m.AsyncLAN8651(slow) as dev:
+            first = asyncio.ensure_future(dev.read_registers([0x10000, 0x10001]))
+            await asyncio.sleep(0.05)
+            second = asyncio.ensure_future(dev.read_register(0x10001))
+            third = asyncio.ensure_future(dev.read_registers([0x10001, 0x10002]))
+            await asyncio.sleep(0.05)
+            slow.release.set()
+            results = await asyncio.gather(first, second, third)
+            return results, dev.coalesced_reads
+
+    results, coalesced = asyncio.run(run())
+    assert results == [{0x10000: 0x00, 0x10001: 0x01}, 0x01, {0x10001: 0x01, 0x10002: 0x02}]
+    # 0x10001 was read once for all three callers, only 0x10002 was added
+    assert slow.batches == [[0x10000, 0x10001], [0x10002]]
+    assert coalesced == 2
+
+def test_async_cancelled_caller_keeps_shared_read():
+    import asyncio
+    slow = SlowDevice()
+
+    async def run():
+        async with m.AsyncLAN8651(slow) as dev:
+            first = asyncio.ensure_future(dev.read_register(0x10000))
+            await asyncio.sleep(0.05)
+            second = asyncio.ensure_future(dev.read_register(0x10000))
+            await asyncio.sleep(0.05)
+            first.cancel()
+            slow.release.set()
+            return await second
+
+    assert asyncio.run(run()) == 0x00
+    assert slow.batches == [[0x10000]]
+
+# Device registry
+
+def test_registry_run_all_without_devices():
+    registry = m.LAN8651Registry(daemon_path=None)
+    registry.devices = []
+    assert registry.select("all") == []
+    assert registry.run("all", lambda dev: dev.read_registers([0x10000])) == []
+
+# Register metadata
+
+def test_side_effect_registers_are_read_alone():
+    mmdctrl, mmdad = R['MMDCTRL'], R['MMDAD']
+    assert m.get_register_info(mmdad).side_effects
+    assert m.plan_burst_reads([R['PHY_ID2'], mmdctrl, mmdad]) == \
+        [(R['PHY_ID2'], 1), (mmdctrl, 1), (mmdad, 1)]
+    assert m.plan_burst_reads([mmdctrl, mmdad, mmdad + 1]) == \
+        [(mmdctrl, 1), (mmdad, 1), (mmdad + 1, 1)]
+
+def test_dump_skips_side_effect_registers(device):
+    sim = device.tc6.transport
+    read = []
+    transfer = sim.transfer
+
+    def record(tx):
+        address, count, write = m.tc6_parse_header(struct.unpack_from('>I', tx)[0])
+        read.extend(range(address, address + count))
+        return transfer(tx)
+
+    sim.transfer = record
+    values = device.dump_registers()
+    assert R['MMDAD'] not in read
+    assert R['MMDAD'] not in values
+    assert R['MMDCTRL'] in values
+    assert device.read_register(R['MMDAD']) == 0
+
+def test_spidev_taken_from_environment_at_creation(monkeypatch):
+    monkeypatch.setenv('LAN8651_SPIDEV', "/dev/spidev1.0")
+    assert m.LAN8651Debugfs().spidev == "/dev/spidev1.0"
+    assert m.LAN8651Debugfs(spidev="/dev/spidev0.0").spidev == "/dev/spidev0.0"
+    monkeypatch.delenv('LAN8651_SPIDEV')
+    assert m.LAN8651Debugfs().spidev is None
+
+# Write checks
+
+@pytest.mark.parametrize('address, value', [
+    (0x30000, -1),
+    (0x30000, 1 << 33),
+    (0x100000, 1),
+    (-1, 1),
+    (R['OA_PHYID'], 1),             # read-only
+    (R['BASIC_CONTROL'], 0x10000),  # wider than the 16-bit register
+])
+def test_write_register_refuses_bad_writes(device, address, value):
+    assert device.write_register(address, value) is False
+    assert device.tc6.transport.transactions == 0
+
+def test_write_register_unknown_register_in_range(device):
+    assert device.write_register(0x30000, 0xFFFFFFFF) is True
+    assert device.tc6.transport.registers[0x30000] == 0xFFFFFFFF
+
+@pytest.mark.parametrize('text', ["-1", "0x100000000", "foo"])
+def test_parse_register_value_rejects(text):
+    with pytest.raises(ValueError):
+        m.parse_register_value(text)
+
+def test_parse_register_address_rejects_out_of_range():
+    with pytest.raises(ValueError):
+        m.parse_register_address("0x100000")
+    assert m.parse_register_address("OA_STATUS0") == R['OA_STATUS0']